@@ -3,94 +3,85 @@
 Функціонал: Юзер може клікати на баночку, кожен клік = 25% наповнення
 """
 
-import json
-import os
 from datetime import datetime
 
+from storage import open_table
+from models import Banka
+from ranking import register_board
+
 # ============ JSON БД ДЛЯ БАНОЧОК ============
 BANKA_DATA_FILE = "banka_data.json"
 
+# Баночки гравців (ключ "user_id_server_id" без кореневого ключа)
+_banka = open_table(
+    "banka", BANKA_DATA_FILE, root=None, sep="_",
+    decode=Banka.from_dict, encode=Banka.to_dict
+)
+
+# Рейтинг за кількістю завершених баночок
+register_board("banka", _banka, lambda banka: banka.total_completed, "🥛 Завершені баночки")
+
 def load_banka_data():
     """Завантажити дані баночок."""
-    if os.path.exists(BANKA_DATA_FILE):
-        try:
-            with open(BANKA_DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    return _banka.document()
 
 def save_banka_data(data):
     """Зберегти дані баночок."""
-    with open(BANKA_DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    _banka.replace(data)
 
 def get_banka_key(user_id: int, server_id: int) -> str:
     """Отримати ключ для користувача."""
     return f"{user_id}_{server_id}"
 
-def get_user_banka(user_id: int, server_id: int) -> dict:
+def _new_banka(user_id: int, server_id: int) -> Banka:
+    """Створити порожню баночку."""
+    return Banka(
+        user_id=user_id,
+        server_id=server_id,
+        created_at=datetime.now().isoformat()
+    )
+
+def get_user_banka(user_id: int, server_id: int) -> Banka:
     """Отримати дані баночки юзера."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key not in data:
-        data[key] = {
-            "user_id": user_id,
-            "server_id": server_id,
-            "progress": 0,  # 0, 25, 50, 75, 100
-            "completed": False,
-            "created_at": datetime.now().isoformat()
-        }
-        save_banka_data(data)
+    if banka is None:
+        banka = _new_banka(user_id, server_id)
+        _banka.put(user_id, server_id, banka)
     
-    return data[key]
+    return banka
 
 def add_progress(user_id: int, server_id: int) -> int:
     """Додати 25% до баночки. Повертає новий прогрес."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key not in data:
-        data[key] = {
-            "user_id": user_id,
-            "server_id": server_id,
-            "progress": 0,
-            "completed": False,
-            "created_at": datetime.now().isoformat()
-        }
+    if banka is None:
+        banka = _new_banka(user_id, server_id)
     
     # Додати 25%
-    if data[key]["progress"] < 100:
-        data[key]["progress"] += 25
+    if banka.progress < 100:
+        banka.progress += 25
     
     # Якщо досяг 100%, позначити як завершено
-    if data[key]["progress"] >= 100:
-        data[key]["progress"] = 100
-        data[key]["completed"] = True
-        data[key]["completed_at"] = datetime.now().isoformat()
+    if banka.progress >= 100:
+        banka.progress = 100
+        banka.completed = True
+        banka.completed_at = datetime.now().isoformat()
     
-    save_banka_data(data)
-    return data[key]["progress"]
+    _banka.put(user_id, server_id, banka)
+    return banka.progress
 
 def reset_user_banka(user_id: int, server_id: int):
     """Скинути баночку юзера (зберігаючи загальний лічильник)."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key in data:
+    if banka is not None:
         # Зберігаємо загальний лічильник
-        total_completed = data[key].get("total_completed", 0)
+        total_completed = banka.total_completed
         
-        data[key] = {
-            "user_id": user_id,
-            "server_id": server_id,
-            "progress": 0,
-            "completed": False,
-            "created_at": datetime.now().isoformat(),
-            "total_completed": total_completed
-        }
-        save_banka_data(data)
+        banka = _new_banka(user_id, server_id)
+        banka.total_completed = total_completed
+        _banka.put(user_id, server_id, banka)
 
 def get_progress_bar(progress: int) -> str:
     """Отримати бар прогресу."""
@@ -100,58 +91,41 @@ def get_progress_bar(progress: int) -> str:
 
 def get_completed_count(user_id: int, server_id: int) -> int:
     """Отримати кількість завершених баночок юзера на сервері."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key in data and data[key].get("completed"):
+    if banka is not None and banka.completed:
         # Лічимо скільки разів юзер завершив баночку
-        return data[key].get("completed_count", 1)
+        return banka.completed_count or 1
     
     return 0
 
 def increment_completed_count(user_id: int, server_id: int):
     """Збільшити лічильник завершених баночок."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key in data:
-        if "completed_count" not in data[key]:
-            data[key]["completed_count"] = 1
-        else:
-            data[key]["completed_count"] += 1
-        save_banka_data(data)
+    if banka is not None:
+        banka.completed_count += 1
+        _banka.put(user_id, server_id, banka)
 
 def get_total_completed_count(user_id: int, server_id: int) -> int:
     """Отримати загальну кількість всіх завершених баночок юзера."""
     # Зберігаємо в окремому полі "total_completed"
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
+    banka = _banka.get(user_id, server_id)
     
-    if key in data:
-        return data[key].get("total_completed", 0)
+    if banka is not None:
+        return banka.total_completed
     
     return 0
 
 def add_to_total_completed(user_id: int, server_id: int):
     """Додати 1 до загальної кількості завершених баночок."""
-    data = load_banka_data()
-    key = get_banka_key(user_id, server_id)
-    
-    if key not in data:
-        data[key] = {
-            "user_id": user_id,
-            "server_id": server_id,
-            "progress": 0,
-            "completed": False,
-            "created_at": datetime.now().isoformat(),
-            "total_completed": 0
-        }
+    banka = _banka.get(user_id, server_id)
     
-    if "total_completed" not in data[key]:
-        data[key]["total_completed"] = 0
+    if banka is None:
+        banka = _new_banka(user_id, server_id)
     
-    data[key]["total_completed"] += 1
-    save_banka_data(data)
+    banka.total_completed += 1
+    _banka.put(user_id, server_id, banka)
 
 # ============ КОНСТАНТИ ============
 COLOR_SUCCESS = 0x2ECC71
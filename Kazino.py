@@ -6,38 +6,58 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import random
-import json
-from clicker import get_player, set_player_money, load_data, save_data
+from clicker import get_player, player_txn, load_data, save_data
+from storage import open_table, run_storage, transaction
+from models import CasinoStats
+from ranking import register_board
+from throttle import cooldowns
 
 # Файл для зберігання казино статистики
 CASINO_DATA_FILE = "casino_data.json"
 
+# Статистика гравців: {"wins", "losses", "total_bet"}
+_casino = open_table(
+    "casino", CASINO_DATA_FILE, root="players", sep="_", indent=4,
+    decode=CasinoStats.from_dict, encode=CasinoStats.to_dict
+)
+
+# Рейтинги казино
+register_board("wins", _casino, lambda stats: stats.wins, "🎰 Перемоги в казино")
+register_board("bet", _casino, lambda stats: stats.total_bet, "💰 Всього поставлено")
+
 def load_casino_data():
     """Завантажити дані казино."""
-    try:
-        with open(CASINO_DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"players": {}}
+    return _casino.document()
 
 def save_casino_data(data):
     """Зберегти дані казино."""
-    with open(CASINO_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    _casino.replace(data)
 
 def get_user_key(user_id, server_id):
     """Отримати ключ користувача."""
     return f"{user_id}_{server_id}"
 
+def get_casino_stats(user_id: int, server_id: int) -> CasinoStats | None:
+    """Отримати казино статистику гравця."""
+    return _casino.get(user_id, server_id)
+
+def record_casino_result(user_id: int, server_id: int, bet_amount: int, is_win: bool):
+    """Зберегти результат гри у статистику."""
+    stats = _casino.get(user_id, server_id)
+    if stats is None:
+        stats = CasinoStats()
+
+    stats.total_bet += bet_amount
+    if is_win:
+        stats.wins += 1
+    else:
+        stats.losses += 1
+
+    _casino.put(user_id, server_id, stats)
+
 def reset_casino_stats(user_id: int, server_id: int) -> bool:
     """Скидує казино статистику гравця. Повертає True якщо успішно."""
-    data = load_casino_data()
-    user_key = get_user_key(user_id, server_id)
-
-    if user_key in data["players"]:
-        del data["players"][user_key]
-        save_casino_data(data)
-        return True
+    _casino.delete(user_id, server_id)
     return True  # Повертаємо True навіть якщо немає статистики
 
 # ============ МЕНЮ КАЗИНО ============
@@ -108,7 +128,7 @@ class CasinoNewBetView(discord.ui.View):
         await interaction.response.defer()
         
         # Отримати гроші користувача
-        player = get_player(self.user_id, self.server_id)
+        player = await run_storage(get_player, self.user_id, self.server_id)
         if not player:
             embed = discord.Embed(
                 title="❌ Помилка",
@@ -118,7 +138,7 @@ class CasinoNewBetView(discord.ui.View):
             await interaction.edit_original_response(embed=embed, view=None)
             return
         
-        current_money = player["money"]
+        current_money = player.money
         
         if current_money < bet_amount:
             embed = discord.Embed(
@@ -173,7 +193,7 @@ class CasinoAmountModal(discord.ui.Modal):
                 return
             
             # Отримати гроші користувача
-            player = get_player(self.user_id, self.server_id)
+            player = await run_storage(get_player, self.user_id, self.server_id)
             if not player:
                 embed = discord.Embed(
                     title="❌ Помилка",
@@ -183,7 +203,7 @@ class CasinoAmountModal(discord.ui.Modal):
                 await interaction.followup.send(embed=embed, ephemeral=True)
                 return
             
-            current_money = player["money"]
+            current_money = player.money
             
             if current_money < bet_amount:
                 embed = discord.Embed(
@@ -279,28 +299,37 @@ class CasinoMultiplierView(discord.ui.View):
     
     async def spin_roulette(self, interaction: discord.Interaction, multiplier: int, win_chance_percent: int):
         """Запустити рулетку"""
-        await interaction.response.defer()
-        
-        # Перевірити баланс ще раз
-        player = get_player(self.user_id, self.server_id)
-        if not player or player["money"] < self.bet_amount:
-            await interaction.edit_original_response(content="❌ У тебе більше немає достатньо грошей!")
+        remaining = cooldowns.hit("casino", self.user_id, self.server_id)
+        if remaining:
+            await interaction.response.send_message(f"❌ Чекай {round(remaining, 2)}s перед наступним спіном!", ephemeral=True)
             return
-        
-        # Відняти ставку
-        new_balance = player["money"] - self.bet_amount
-        set_player_money(self.user_id, self.server_id, new_balance)
+
+        await interaction.response.defer()
         
         # Рандом результат
         win_chance = random.randint(1, 100)
         is_win = win_chance <= win_chance_percent
+        winnings = int(self.bet_amount * multiplier) if is_win else 0
+        
+        def settle_bet():
+            """Перевіряє баланс, списує ставку, нараховує виграш і пише статистику за одну транзакцію."""
+            with transaction():
+                with player_txn(self.user_id, self.server_id) as player:
+                    if not player or player.money < self.bet_amount:
+                        return None
+                    player.money += winnings - self.bet_amount
+                    balance = player.money
+                # Зберегти статистику (помилка тут відкочує і баланс)
+                record_casino_result(self.user_id, self.server_id, self.bet_amount, is_win)
+            return balance
+        
+        final_balance = await run_storage(settle_bet)
+        if final_balance is None:
+            await interaction.edit_original_response(content="❌ У тебе більше немає достатньо грошей!")
+            return
         
         # Рахунок результату
         if is_win:
-            winnings = int(self.bet_amount * multiplier)
-            final_balance = new_balance + winnings
-            set_player_money(self.user_id, self.server_id, final_balance)
-            
             # Повідомлення про перемогу
             bet_type_name = "Червоний" if self.bet_type == "red" else "Чорний" if self.bet_type == "black" else "Жовтий"
             result_emoji = "✅"
@@ -318,8 +347,6 @@ class CasinoMultiplierView(discord.ui.View):
             embed.set_footer(text=f"Шанс виграшу: {win_chance_percent}%")
             
         else:
-            final_balance = new_balance
-            
             embed = discord.Embed(
                 title="🎰 КАЗИНО - ПОРАЗКА",
                 description=f"❌ На цей раз не пощастило...\n\n"
@@ -331,21 +358,6 @@ class CasinoMultiplierView(discord.ui.View):
             )
             embed.set_footer(text=f"Шанс виграшу був: {win_chance_percent}%")
         
-        # Зберегти статистику
-        casino_data = load_casino_data()
-        user_key = get_user_key(self.user_id, self.server_id)
-        
-        if user_key not in casino_data["players"]:
-            casino_data["players"][user_key] = {"wins": 0, "losses": 0, "total_bet": 0}
-        
-        casino_data["players"][user_key]["total_bet"] += self.bet_amount
-        if is_win:
-            casino_data["players"][user_key]["wins"] += 1
-        else:
-            casino_data["players"][user_key]["losses"] += 1
-        
-        save_casino_data(casino_data)
-        
         # Додати кнопки результату
         view = CasinoResultView(self.user_id, self.server_id, self.bet_amount, None)
         await interaction.edit_original_response(embed=embed, view=view)
@@ -360,7 +372,7 @@ async def setup_casino(bot: commands.Bot):
         """🎰 Вступи в казино!"""
         
         # Перевірити чи користувач має профіль
-        player = get_player(ctx.author.id, ctx.guild.id)
+        player = await run_storage(get_player, ctx.author.id, ctx.guild.id)
         if not player:
             embed = discord.Embed(
                 title="❌ Ты ще не грав!",
@@ -374,7 +386,7 @@ async def setup_casino(bot: commands.Bot):
         embed = discord.Embed(
             title="🎰 КАЗИНО",
             description=f"Ласкаво просимо в казино!\n\n"
-                        f"**Твій баланс:** {player['money']:,} 💵\n\n"
+                        f"**Твій баланс:** {player.money:,} 💵\n\n"
                         f"**Як працює казино:**\n"
                         f"1️⃣ Введи суму ставки (мінімум 100)\n"
                         f"2️⃣ Вибери колір: 🔴 Червоне, ⚫ Чорне, 🟡 Жовтий\n"
@@ -406,10 +418,9 @@ async def setup_casino(bot: commands.Bot):
     async def casino_stats_command(ctx):
         """📊 Твоя казино статистика"""
         
-        casino_data = load_casino_data()
-        user_key = get_user_key(ctx.author.id, ctx.guild.id)
+        stats = await run_storage(get_casino_stats, ctx.author.id, ctx.guild.id)
         
-        if user_key not in casino_data["players"]:
+        if stats is None:
             embed = discord.Embed(
                 title="📊 Казино Статистика",
                 description="Ти ще не грав у казино!",
@@ -418,18 +429,17 @@ async def setup_casino(bot: commands.Bot):
             await ctx.send(embed=embed)
             return
         
-        stats = casino_data["players"][user_key]
-        total_games = stats["wins"] + stats["losses"]
-        win_rate = (stats["wins"] / total_games * 100) if total_games > 0 else 0
+        total_games = stats.wins + stats.losses
+        win_rate = (stats.wins / total_games * 100) if total_games > 0 else 0
         
         embed = discord.Embed(
             title=f"📊 Казино Статистика - {ctx.author.name}",
             color=0x3498DB
         )
-        embed.add_field(name="✅ Перемог", value=f"{stats['wins']}", inline=True)
-        embed.add_field(name="❌ Поразок", value=f"{stats['losses']}", inline=True)
+        embed.add_field(name="✅ Перемог", value=f"{stats.wins}", inline=True)
+        embed.add_field(name="❌ Поразок", value=f"{stats.losses}", inline=True)
         embed.add_field(name="🎮 Всього ігор", value=f"{total_games}", inline=True)
         embed.add_field(name="📈 Процент перемог", value=f"{win_rate:.1f}%", inline=True)
-        embed.add_field(name="💰 Всього поставлено", value=f"{stats['total_bet']:,} 💵", inline=True)
+        embed.add_field(name="💰 Всього поставлено", value=f"{stats.total_bet:,} 💵", inline=True)
         
         await ctx.send(embed=embed)
@@ -0,0 +1,68 @@
+"""
+Асинхронні версії функцій сховища для Discord Бота
+Виклики виконуються по черзі в потоці сховища, а не в циклі подій
+"""
+
+from storage import to_async, flush_all
+
+from clicker import (
+    create_player, get_player, update_player, add_money, update_click_time,
+    upgrade_income_per_click, upgrade_income_per_sec,
+    set_player_money, set_player_level, set_income_per_click, set_income_per_sec,
+    issue_certificate, get_server_top, reset_player_progress,
+    queue_click, apply_pending_clicks, get_player_rank, get_rank_around,
+    get_certified_page, count_certified_players
+)
+from biznes import (
+    get_player_businesses, buy_business, reset_player_businesses,
+    get_total_profit, apply_business_profits
+)
+from kazino import get_casino_stats, record_casino_result, reset_casino_stats
+from banka import (
+    get_user_banka, add_progress, reset_user_banka,
+    get_total_completed_count, add_to_total_completed
+)
+
+# ============ СХОВИЩЕ ============
+flush_all_async = to_async(flush_all)
+
+# ============ КЛІКЕР ============
+create_player_async = to_async(create_player)
+get_player_async = to_async(get_player)
+update_player_async = to_async(update_player)
+add_money_async = to_async(add_money)
+update_click_time_async = to_async(update_click_time)
+upgrade_income_per_click_async = to_async(upgrade_income_per_click)
+upgrade_income_per_sec_async = to_async(upgrade_income_per_sec)
+set_player_money_async = to_async(set_player_money)
+set_player_level_async = to_async(set_player_level)
+set_income_per_click_async = to_async(set_income_per_click)
+set_income_per_sec_async = to_async(set_income_per_sec)
+issue_certificate_async = to_async(issue_certificate)
+get_server_top_async = to_async(get_server_top)
+reset_player_progress_async = to_async(reset_player_progress)
+queue_click_async = to_async(queue_click)
+apply_pending_clicks_async = to_async(apply_pending_clicks)
+get_player_rank_async = to_async(get_player_rank)
+get_rank_around_async = to_async(get_rank_around)
+get_certified_page_async = to_async(get_certified_page)
+count_certified_players_async = to_async(count_certified_players)
+
+# ============ БІЗНЕС ============
+get_player_businesses_async = to_async(get_player_businesses)
+buy_business_async = to_async(buy_business)
+reset_player_businesses_async = to_async(reset_player_businesses)
+get_total_profit_async = to_async(get_total_profit)
+apply_business_profits_async = to_async(apply_business_profits)
+
+# ============ КАЗИНО ============
+get_casino_stats_async = to_async(get_casino_stats)
+record_casino_result_async = to_async(record_casino_result)
+reset_casino_stats_async = to_async(reset_casino_stats)
+
+# ============ БАНОЧКА ============
+get_user_banka_async = to_async(get_user_banka)
+add_progress_async = to_async(add_progress)
+reset_user_banka_async = to_async(reset_user_banka)
+get_total_completed_count_async = to_async(get_total_completed_count)
+add_to_total_completed_async = to_async(add_to_total_completed)
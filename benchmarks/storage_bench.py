@@ -0,0 +1,231 @@
+"""
+Бенчмарк сховища для Discord Бота
+Генерує синтетичних гравців і міряє затримки операцій клікера, бізнесу і казино
+
+Використання (з кореня репозиторію):
+    python benchmarks/storage_bench.py --players 10000,100000 --backend json,sqlite
+    python benchmarks/storage_bench.py --players 1000000 --servers 500 --out bench.json
+
+Кожна комбінація (бекенд, кількість гравців) запускається в окремому процесі
+в тимчасовій теці, тому файли бота не чіпаються. Результат - JSON.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUSINESS_OWNERS_SHARE = 0.2  # Частка гравців з бізнесами
+CASINO_PLAYERS_SHARE = 0.1  # Частка гравців з казино статистикою
+PROFIT_TICKS = 5  # Скільки разів міряти profit_loop (він проходить по всіх)
+
+# ============ СТАТИСТИКА ============
+
+def percentile(sorted_values: list, share: float) -> float:
+    """Перцентиль відсортованого списку (найближчий ранг)."""
+    index = min(len(sorted_values) - 1, max(0, int(round(share * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(samples_ns: list) -> dict:
+    """Зводить виміри (наносекунди) у мікросекунди: p50/p90/p99/max/mean."""
+    values = sorted(samples_ns)
+    to_us = lambda value: round(value / 1000, 2)
+    return {
+        "count": len(values),
+        "p50_us": to_us(percentile(values, 0.50)),
+        "p90_us": to_us(percentile(values, 0.90)),
+        "p99_us": to_us(percentile(values, 0.99)),
+        "max_us": to_us(values[-1]),
+        "mean_us": to_us(sum(values) / len(values)),
+    }
+
+def measure(func, args_list: list) -> dict:
+    """Викликає func(*args) для кожного набору аргументів і зводить затримки."""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter_ns()
+        func(*args)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+# ============ ОДИН ПРОГІН (ДОЧІРНІЙ ПРОЦЕС) ============
+
+def run_worker(players: int, servers: int, ops: int, seed: int) -> dict:
+    """Заповнює сховище і міряє операції. Викликається в тимчасовій теці."""
+    sys.path.insert(0, REPO_DIR)
+    import storage
+    from models import Player, BusinessHolding, CasinoStats
+    from clicker import (
+        _players, create_player, player_txn, get_server_top, queue_click, apply_pending_clicks
+    )
+    from biznes import _businesses, BUSINESSES, buy_business, apply_business_profits
+    from kazino import _casino, record_casino_result
+
+    rng = random.Random(seed)
+    server_ids = [10_000 + index for index in range(servers)]
+    results = {}
+
+    # Заповнення: гравці рівномірно по серверах
+    start = time.perf_counter()
+    population = []
+    with storage.lock:
+        for index in range(players):
+            user_id, server_id = 1_000_000 + index, server_ids[index % servers]
+            population.append((user_id, server_id))
+            _players.put(user_id, server_id, Player(
+                user_id=user_id,
+                server_id=server_id,
+                money=rng.randint(0, 1_000_000),
+                income_per_click=rng.randint(1, 50),
+                level=rng.randint(1, 50),
+                created_at=datetime.now().isoformat()
+            ))
+            if rng.random() < BUSINESS_OWNERS_SHARE:
+                business = rng.choice(BUSINESSES)
+                _businesses.put(user_id, server_id, {business["key"]: BusinessHolding(
+                    name=business["name"], price=business["price"], emoji=business["emoji"],
+                    count=rng.randint(1, 5), bought_at=datetime.now().isoformat()
+                )})
+            if rng.random() < CASINO_PLAYERS_SHARE:
+                _casino.put(user_id, server_id, CasinoStats(wins=rng.randint(0, 20), losses=rng.randint(0, 20)))
+    populate_s = time.perf_counter() - start
+
+    # close_all - запис разом з очікуванням потоку запису і ущільнення журналу
+    start = time.perf_counter()
+    storage.close_all()
+    initial_flush_s = time.perf_counter() - start
+
+    sample = lambda: rng.choice(population)
+
+    # create_player - нові гравці
+    results["create_player"] = measure(create_player, [
+        (2_000_000 + index, rng.choice(server_ids)) for index in range(ops)
+    ])
+
+    # Клік як у GameView: лише рахується в пам'яті...
+    results["click"] = measure(queue_click, [(*sample(), time.time()) for _ in range(ops)])
+    # ...а apply_clicks_loop записує всі накопичені кліки однією пачкою
+    results["click_batch"] = measure(apply_pending_clicks, [()])
+
+    results["get_server_top"] = measure(get_server_top, [
+        (rng.choice(server_ids), 10) for _ in range(ops)
+    ])
+
+    # Купівля бізнесу з балансу гравця (як !buybusiness)
+    def buy(user_id, server_id, business_index):
+        with player_txn(user_id, server_id) as player:
+            success, _, new_money = buy_business(user_id, server_id, business_index, player.money)
+            if success:
+                player.money = int(new_money)
+    results["buy_business"] = measure(buy, [
+        (*sample(), rng.randrange(len(BUSINESSES))) for _ in range(ops)
+    ])
+
+    # Один тік profit_loop - нарахування всім власникам бізнесів
+    results["profit_tick"] = measure(apply_business_profits, [() for _ in range(PROFIT_TICKS)])
+
+    # Спін казино: ставка, виграш і статистика (як spin_roulette)
+    def spin(user_id, server_id, bet_amount, is_win):
+        with player_txn(user_id, server_id) as player:
+            if player.money < bet_amount:
+                return
+            player.money += (bet_amount * 2 if is_win else 0) - bet_amount
+        record_casino_result(user_id, server_id, bet_amount, is_win)
+    results["casino_spin"] = measure(spin, [
+        (*sample(), rng.randint(10, 1000), rng.random() < 0.4) for _ in range(ops)
+    ])
+
+    # Запис змін після навантаження
+    results["flush_all"] = measure(storage.close_all, [()])
+
+    disk_bytes = 0
+    for root, _, files in os.walk("."):
+        disk_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+
+    return {
+        "populate_s": round(populate_s, 3),
+        "initial_flush_s": round(initial_flush_s, 3),
+        "disk_bytes": disk_bytes,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        "operations": results,
+    }
+
+# ============ ЗАПУСК ============
+
+def run_case(backend: str, snapshot_format: str, players: int, args) -> dict:
+    """Запускає один прогін в окремому процесі і тимчасовій теці."""
+    env = dict(os.environ, STORAGE_BACKEND=backend, SNAPSHOT_FORMAT=snapshot_format)
+    with tempfile.TemporaryDirectory(prefix="storage_bench_") as work_dir:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             "--players", str(players), "--servers", str(args.servers),
+             "--ops", str(args.ops), "--seed", str(args.seed)],
+            cwd=work_dir, env=env, capture_output=True, text=True
+        )
+    if output.returncode != 0:
+        print(f"❌ Прогін {backend}/{players} впав:\n{output.stderr}", file=sys.stderr)
+        return {"error": output.stderr.strip().splitlines()[-1:]}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сховища бота")
+    parser.add_argument("--players", default="10000,100000",
+                        help="кількості гравців через кому (напр. 10000,100000,1000000)")
+    parser.add_argument("--servers", type=int, default=100, help="кількість серверів")
+    parser.add_argument("--ops", type=int, default=2000, help="вимірів на операцію")
+    parser.add_argument("--backend", default="json", help="бекенди через кому: json,journal,sharded,sqlite")
+    parser.add_argument("--snapshot-format", default="json", help="json або binary (для файлових бекендів)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="файл для JSON результатів (інакше stdout)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(int(args.players), args.servers, args.ops, args.seed)))
+        return
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "servers": args.servers,
+            "ops": args.ops,
+            "seed": args.seed,
+            "snapshot_format": args.snapshot_format,
+        },
+        "runs": [],
+    }
+    for backend in args.backend.split(","):
+        for players in (int(value) for value in args.players.split(",")):
+            print(f"⏱️ {backend}: {players:,} гравців...", file=sys.stderr)
+            report["runs"].append({
+                "backend": backend,
+                "players": players,
+                **run_case(backend, args.snapshot_format, players, args),
+            })
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ Результати збережено в {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,27 @@
 Вкладання в бізнеси з пасивним доходом
 """
 
-import os
-import json
 import discord
 from discord.ext import commands, tasks
 from datetime import datetime
 import asyncio
 
+from storage import open_table, run_storage, RecordVersions
+from models import BusinessHolding, decode_businesses, encode_businesses
+from ranking import register_board
+
 # ============ JSON БД ============
 BUSINESS_DATA_FILE = "business_data.json"
 
+# Бізнеси гравців: {business_key: {...}} на кожного гравця
+_businesses = open_table(
+    "businesses", BUSINESS_DATA_FILE, root="businesses", sep="-",
+    decode=decode_businesses, encode=encode_businesses
+)
+
+# Версії бізнесів гравців: прибиль перераховується лише після їх зміни
+_business_versions = RecordVersions(_businesses)
+
 # ============ КОНФІГ БІЗНЕСІВ ============
 BUSINESSES = [
     {"key": "park", "name": "🎪 Парк", "price": 40000, "emoji": "🎪"},
@@ -36,19 +47,12 @@ BUSINESS_CHANNEL_ID = 1462580804998926336
 # ============ ФУНКЦІЇ РОБОТИ З ДАНИМИ ============
 
 def load_business_data():
-    """Завантажує дані про бізнеси з JSON."""
-    if os.path.exists(BUSINESS_DATA_FILE):
-        try:
-            with open(BUSINESS_DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return {"businesses": {}}
-    return {"businesses": {}}
+    """Повертає документ з бізнесами всіх гравців."""
+    return _businesses.document()
 
 def save_business_data(data):
-    """Зберігає дані про бізнеси у JSON."""
-    with open(BUSINESS_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Замінює документ з бізнесами всіх гравців."""
+    _businesses.replace(data)
 
 def get_player_business_key(user_id: int, server_id: int) -> str:
     """Генерує ключ для бізнесу гравця."""
@@ -56,9 +60,7 @@ def get_player_business_key(user_id: int, server_id: int) -> str:
 
 def get_player_businesses(user_id: int, server_id: int) -> dict:
     """Отримує всі бізнеси гравця."""
-    data = load_business_data()
-    key = get_player_business_key(user_id, server_id)
-    return data["businesses"].get(key, {})
+    return _businesses.get(user_id, server_id) or {}
 
 def buy_business(user_id: int, server_id: int, business_index: int, player_money: int) -> tuple:
     """
@@ -67,9 +69,6 @@ def buy_business(user_id: int, server_id: int, business_index: int, player_money
     if business_index < 0 or business_index >= len(BUSINESSES):
         return False, None, None
 
-    data = load_business_data()
-    player_key = get_player_business_key(user_id, server_id)
-
     business = BUSINESSES[business_index]
     business_key = business["key"]
     price = business["price"]
@@ -78,35 +77,28 @@ def buy_business(user_id: int, server_id: int, business_index: int, player_money
         return False, None, None
 
     # Ініціалізуємо бізнеси гравця якщо потрібно
-    if player_key not in data["businesses"]:
-        data["businesses"][player_key] = {}
+    businesses = _businesses.get(user_id, server_id) or {}
 
     # Додаємо або збільшуємо кількість бізнесу
-    if business_key in data["businesses"][player_key]:
-        data["businesses"][player_key][business_key]["count"] += 1
+    if business_key in businesses:
+        businesses[business_key].count += 1
     else:
-        data["businesses"][player_key][business_key] = {
-            "name": business["name"],
-            "price": price,
-            "emoji": business["emoji"],
-            "count": 1,
-            "bought_at": datetime.now().isoformat()
-        }
+        businesses[business_key] = BusinessHolding(
+            name=business["name"],
+            price=price,
+            emoji=business["emoji"],
+            count=1,
+            bought_at=datetime.now().isoformat()
+        )
 
     new_money = player_money - price
-    save_business_data(data)
+    _businesses.put(user_id, server_id, businesses)
 
     return True, price, new_money
 
 def reset_player_businesses(user_id: int, server_id: int) -> bool:
     """Скидує всі бізнеси гравця. Повертає True якщо успішно."""
-    data = load_business_data()
-    player_key = get_player_business_key(user_id, server_id)
-
-    if player_key in data["businesses"]:
-        del data["businesses"][player_key]
-        save_business_data(data)
-        return True
+    _businesses.delete(user_id, server_id)
     return True  # Повертаємо True навіть якщо немає бізнесів
 
 def calculate_profit(price: float) -> float:
@@ -115,7 +107,14 @@ def calculate_profit(price: float) -> float:
 
 def get_total_profit(user_id: int, server_id: int) -> float:
     """Розраховує загальну прибиль за всі бізнеси гравця."""
-    businesses = get_player_businesses(user_id, server_id)
+    return calculate_businesses_profit(get_player_businesses(user_id, server_id))
+
+def get_businesses_version(user_id: int, server_id: int) -> tuple:
+    """Версія бізнесів гравця (змінюється з кожною купівлею або скиданням)."""
+    return _business_versions.version(user_id, server_id)
+
+def calculate_businesses_profit(businesses: dict) -> float:
+    """Розраховує прибиль за набір бізнесів (ціни беруться з конфігу)."""
     total_profit = 0
 
     for business_key, business_data in businesses.items():
@@ -123,13 +122,32 @@ def get_total_profit(user_id: int, server_id: int) -> float:
         for business in BUSINESSES:
             if business["key"] == business_key:
                 price = business["price"]
-                count = business_data.get("count", 1)
-                profit = calculate_profit(price) * count
+                profit = calculate_profit(price) * business_data.count
                 total_profit += profit
                 break
 
     return total_profit
 
+# Рейтинг за прибилю від бізнесів (💵 за 15 секунд)
+register_board("business", _businesses, calculate_businesses_profit, "💼 Прибиль бізнесів", ",.2f")
+
+def apply_business_profits() -> int:
+    """Нараховує прибиль від бізнесів усім гравцям. Повертає кількість гравців."""
+    # Імпортуємо функції з clicker
+    from clicker import add_money, get_player
+
+    paid = 0
+    # Один прохід по таблиці: вибірка по серверу в JSON і SQLite - теж повний прохід
+    for user_id, server_id, businesses in _businesses.scan():
+        total_profit = calculate_businesses_profit(businesses)
+
+        # Додаємо прибиль тільки гравцям з профілем
+        if total_profit > 0 and get_player(user_id, server_id) is not None:
+            add_money(user_id, server_id, total_profit)
+            paid += 1
+
+    return paid
+
 # ============ КОМАНДИ ============
 
 def get_business_cog(bot):
@@ -147,19 +165,19 @@ def get_business_cog(bot):
         async def buy_business_command(self, ctx, business_num: int = None):
             """Показує каталог бізнесів або купує бізнес по номеру."""
             # Імпортуємо функції з clicker для перевірки грошей
-            from clicker import get_player, set_player_money
+            from clicker import get_player, player_txn
 
             user_id = ctx.author.id
             server_id = ctx.guild.id
 
-            player = get_player(user_id, server_id)
+            player = await run_storage(get_player, user_id, server_id)
             if not player:
                 await ctx.send("❌ У тебе немає профілю! Використай `!start`")
                 return
 
             # Якщо не передав аргумент - показуємо каталог
             if business_num is None:
-                player_money = player["money"]
+                player_money = player.money
 
                 # Створюємо embed з каталогом
                 embed = discord.Embed(
@@ -205,13 +223,20 @@ def get_business_cog(bot):
                 await ctx.send(f"❌ Бізнес #{business_num} не знайдено. Використай `!buybusiness` для списку.")
                 return
 
-            # Купуємо бізнес
-            success, price, new_money = buy_business(user_id, server_id, business_index, player["money"])
+            def buy():
+                """Купує бізнес і списує гроші в одній транзакції гравця (в потоці сховища)."""
+                with player_txn(user_id, server_id) as player:
+                    success, price, new_money = buy_business(user_id, server_id, business_index, player.money)
+                    if success:
+                        player.money = int(new_money)
+                return success, price, new_money, player.money
+
+            success, price, new_money, money = await run_storage(buy)
 
             if not success:
                 business = BUSINESSES[business_index]
                 required = business["price"]
-                missing = required - player["money"]
+                missing = required - money
                 await ctx.send(
                     f"❌ Не вистачає грошей!\n"
                     f"💰 Потрібно: **{required:,}** 💵\n"
@@ -219,9 +244,6 @@ def get_business_cog(bot):
                 )
                 return
 
-            # Оновлюємо баланс у clicker.py
-            set_player_money(user_id, server_id, int(new_money))
-
             business = BUSINESSES[business_index]
             profit_per_15_sec = calculate_profit(business["price"])
 
@@ -257,18 +279,18 @@ def get_business_cog(bot):
             user_id = ctx.author.id
             server_id = ctx.guild.id
 
-            player = get_player(user_id, server_id)
+            player = await run_storage(get_player, user_id, server_id)
             if not player:
                 await ctx.send("❌ У тебе немає профілю! Використай `!start`")
                 return
 
-            businesses = get_player_businesses(user_id, server_id)
+            businesses = await run_storage(get_player_businesses, user_id, server_id)
 
             if not businesses:
                 await ctx.send("❌ У тебе немає жодного бізнесу. Використай `!buybusiness` щоб купити.")
                 return
 
-            total_profit = get_total_profit(user_id, server_id)
+            total_profit = await run_storage(get_total_profit, user_id, server_id)
 
             embed = discord.Embed(
                 title="💼 Мої Бізнеси",
@@ -277,10 +299,10 @@ def get_business_cog(bot):
             )
 
             for business_key, business_data in businesses.items():
-                count = business_data.get("count", 1)
-                emoji = business_data.get("emoji", "📦")
-                name = business_data.get("name", "Невідомий")
-                price = business_data.get("price", 0)
+                count = business_data.count
+                emoji = business_data.emoji or "📦"
+                name = business_data.name or "Невідомий"
+                price = business_data.price
 
                 profit_per_15_sec = calculate_profit(price) * count
 
@@ -304,45 +326,8 @@ def get_business_cog(bot):
         async def profit_loop(self):
             """Додає прибиль від бізнесів кожні 15 секунд."""
             try:
-                # Імпортуємо функції з clicker
-                from clicker import load_data, save_data, get_player_key
-
-                data = load_business_data()
-                player_data = load_data()
-
-                # Розраховуємо прибиль за кожен бізнес
-                for player_key_business, businesses in data["businesses"].items():
-                    # Формат ключа: user_id-server_id
-                    parts = player_key_business.split("-")
-                    if len(parts) != 2:
-                        continue
-                    
-                    try:
-                        user_id, server_id = int(parts[0]), int(parts[1])
-                    except ValueError:
-                        continue
-
-                    player_key = get_player_key(user_id, server_id)
-
-                    if player_key not in player_data["users"]:
-                        continue
-
-                    total_profit = 0
-                    for business_key, business_data in businesses.items():
-                        # Знайдемо бізнес у нашому конфігу
-                        business_config = next((b for b in BUSINESSES if b["key"] == business_key), None)
-                        if business_config:
-                            # Використовуємо ціну з конфігу, а не з бізнесу
-                            price = business_config["price"]
-                            count = business_data.get("count", 1)
-                            profit = calculate_profit(price) * count
-                            total_profit += profit
-
-                    # Додаємо прибиль
-                    if total_profit > 0:
-                        player_data["users"][player_key]["money"] += total_profit
-
-                save_data(player_data)
+                # Нарахування виконується в потоці сховища
+                await run_storage(apply_business_profits)
 
             except Exception as e:
                 print(f"❌ Помилка в циклі прибилі бізнесів: {e}")
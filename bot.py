@@ -5,6 +5,7 @@ Idle гра з server-specific економікою (JSON)
 
 import os
 import json
+import asyncio
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
@@ -19,26 +20,43 @@ load_dotenv()
 
 # Імпортуємо клікер механіку
 from clicker import (
-    load_data, save_data, get_player_key, create_player, get_player,
-    add_money, update_click_time, upgrade_income_per_click,
-    set_player_money, set_player_level, set_income_per_click,
-    set_income_per_sec, issue_certificate, get_server_top, DATA_FILE, clear_active_game,
-    calculate_upgrade_cost, BASE_CLICK_UPGRADE_COST,
-    reset_player_progress
+    get_player_key, get_player, set_income_per_sec,
+    calculate_upgrade_cost, BASE_CLICK_UPGRADE_COST, reset_player_progress, flush_data,
+    buy_click_upgrades, buy_idle_upgrades, MAX_BULK_UPGRADES, CLICK_BATCH_INTERVAL,
+    get_player_version
+)
+
+# Імпортуємо сховище (запис змін на диск, транзакції між модулями)
+from storage import FLUSH_INTERVAL, transaction, run_storage, load_all
+
+# Асинхронні версії функцій сховища (для обробників кнопок і фонових циклів)
+from async_storage import (
+    get_player_async, update_player_async, get_total_profit_async, flush_all_async,
+    queue_click_async, apply_pending_clicks_async, create_player_async, issue_certificate_async,
+    get_player_rank_async, get_rank_around_async, get_certified_page_async,
+    count_certified_players_async, get_user_banka_async, add_progress_async,
+    reset_user_banka_async, get_total_completed_count_async, add_to_total_completed_async
 )
 
 # Імпортуємо систему бізнесу
-from biznes import setup_business, get_total_profit, reset_player_businesses
+from biznes import setup_business, reset_player_businesses, get_businesses_version
 
 # Імпортуємо казино модуль
 from kazino import setup_casino, reset_casino_stats
 
+# Імена користувачів для рейтингів
+from user_resolver import UserResolver
+
+# Рейтинги за різними показниками (!top [назва])
+from ranking import BOARDS
+
+# Cooldown дій гравця (апгрейд, баночка, казино) і ліміт кліків
+from throttle import cooldowns, click_limiter, channel_edits
+
 # Імпортуємо модуль баночки молочка
 from banka import (
-    load_banka_data, save_banka_data, get_banka_key, get_user_banka,
-    add_progress, reset_user_banka, get_progress_bar,
-    BANKA_IMAGE_URL, BANKA_COMPLETE_IMAGE_URL,
-    get_total_completed_count, add_to_total_completed
+    load_banka_data, save_banka_data, get_banka_key, get_progress_bar,
+    BANKA_IMAGE_URL, BANKA_COMPLETE_IMAGE_URL
 )
 
 # ============ КОНФІГ ============
@@ -53,7 +71,19 @@ APP_ID = int(os.getenv("APP_ID", "0"))
 
 # URL фотки сертифіката
 CERTIFICATE_IMAGE_URL = os.getenv("CERTIFICATE_IMAGE_URL")
-CLICK_COOLDOWN = 0.5
+# Рейтинг: гравців на сторінці і скільки секунд тримати готову сторінку
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_CACHE_TTL = 5
+
+# Оновлення меню клікера: інтервал тіку і скільки редагувань одночасно
+DISPLAY_TICK = 2
+DISPLAY_CONCURRENCY = 10
+# Меню без взаємодії оновлюються рідше: інтервал подвоюється кожні
+# DISPLAY_BACKOFF_STEP секунд (до DISPLAY_MAX_INTERVAL), а після DISPLAY_GAME_TTL меню знімається
+DISPLAY_BACKOFF_STEP = 30
+DISPLAY_MAX_INTERVAL = 60
+DISPLAY_GAME_TTL = 15 * 60
+CERTIFIED_PAGE_SIZE = 20  # Сертифікованих користувачів на сторінці !userscertification
 
 COLOR_SUCCESS = 0x2ECC71
 COLOR_WARNING = 0xF39C12
@@ -95,8 +125,27 @@ intents.members = True
 intents.presences = True
 bot = commands.Bot(intents=intents, application_id=APP_ID, command_prefix=["!", "/"], help_command=None)
 
-# Для cooldown
-click_cooldowns = {}
+# Імена користувачів для рейтингів (кеш + паралельні запити)
+user_resolver = UserResolver(bot)
+
+# Готові сторінки рейтингу
+# Формат: {(server_id, рейтинг, курсор, вперед): (час закінчення, (embed, курсор назад, курсор вперед))}
+leaderboard_pages = {}
+
+# Готові екрани гри
+# Формат: {(user_id, server_id): (версія гравця, версія бізнесів, ім'я, прибиль від бізнесу, embed)}
+game_embeds = {}
+
+# Що востаннє показано в повідомленні кожної активної гри
+# Формат: {(user_id, server_id): (message.id, embed, вміст embed)}
+game_pushed = {}
+
+# Статистика оновлення меню (для !limits)
+display_stats = {"edits": 0, "unchanged": 0, "throttled": 0, "dropped": 0, "overruns": 0, "retired": 0}
+
+# Розклад оновлення активних ігор
+# Формат: {(user_id, server_id): (час останньої взаємодії, час останнього оновлення)}
+game_activity = {}
 
 # Активні ігри для оновлення в реальному часі
 # Формат: {(user_id, server_id): (message, channel)}
@@ -128,8 +177,7 @@ def save_actions(actions):
 
 def init_files():
     """Ініціалізує необхідні JSON файли."""
-    if not os.path.exists(DATA_FILE):
-        save_data({"users": {}})
+    flush_data()
     if not os.path.exists(ACTIONS_FILE):
         save_actions({})
     if not os.path.exists(ADMINS_FILE):
@@ -289,16 +337,9 @@ async def users_certification_command(ctx):
         await ctx.send("⛔ Ти не маєш доступу до адмін-команд.")
         return
 
-    data = load_data()
-    server_id = ctx.guild.id
+    page = await render_certified_page(ctx.guild)
 
-    # Фільтруємо користувачів з сертифікатом на цьому сервері
-    certified_users = [
-        player for player in data["users"].values()
-        if player["server_id"] == server_id and player.get("has_certificate", False)
-    ]
-
-    if not certified_users:
+    if page is None:
         embed = discord.Embed(
             title="🎖️ Сертифікована користувачі",
             description="На цьому сервері немає користувачів з сертифікатом.",
@@ -307,11 +348,23 @@ async def users_certification_command(ctx):
         await ctx.send(embed=embed)
         return
 
+    embed, prev_cursor, next_cursor = page
+    view = PageView(ctx.author.id, render_certified_page, prev_cursor, next_cursor)
+    await ctx.send(embed=embed, view=view)
+
+async def render_certified_page(guild, cursor=None, forward: bool = True):
+    """Сторінка списку сертифікованих: (embed, курсор назад, курсор вперед) або None якщо список порожній."""
+    start, certified_users, prev_cursor, next_cursor = await get_certified_page_async(
+        guild.id, cursor, forward, CERTIFIED_PAGE_SIZE
+    )
+    if not certified_users:
+        return None
+
     # Створити списко сертифікованих користувачів
     certification_list = []
     for player in certified_users:
-        user_mention = f"<@{player['user_id']}>"
-        cert_date = player.get("certificate_date", "Невідомо")
+        user_mention = f"<@{player.user_id}>"
+        cert_date = player.certificate_date or "Невідомо"
         if cert_date and cert_date != "Невідомо":
             # Форматувати дату
             try:
@@ -329,8 +382,10 @@ async def users_certification_command(ctx):
         description="\n".join(certification_list) if certification_list else "Немає.",
         color=COLOR_SUCCESS
     )
-    embed.set_footer(text=f"Всього: {len(certified_users)}")
-    await ctx.send(embed=embed)
+    last_position = start + len(certified_users) - 1
+    total = await count_certified_players_async(guild.id)
+    embed.set_footer(text=f"{start}-{last_position} | Всього: {total}")
+    return embed, prev_cursor, next_cursor
 
 @bot.command(name="addmoney")
 async def add_money_command(ctx, member: discord.Member = None, amount: int = None):
@@ -348,14 +403,19 @@ async def add_money_command(ctx, member: discord.Member = None, amount: int = No
         return
 
     server_id = ctx.guild.id
-    if set_player_money(member.id, server_id, (get_player(member.id, server_id)["money"] if get_player(member.id, server_id) else 0) + amount):
-        player = get_player(member.id, server_id)
+
+    def add(player):
+        """Видає гроші (в потоці сховища)."""
+        player.money += amount
+        return player
+    player = await update_player_async(member.id, server_id, add)
+    if player:
         embed = discord.Embed(
             title=f"💵 Гроші видані",
             description=f"Виданої {amount} 💵 користувачу {member.mention}",
             color=discord.Color.green()
         )
-        embed.add_field(name="Новий баланс", value=f"**{player['money']:,}** 💵", inline=False)
+        embed.add_field(name="Новий баланс", value=f"**{player.money:,}** 💵", inline=False)
         await ctx.send(embed=embed)
     else:
         await ctx.send(f"❌ У користувача {member.mention} немає профілю!")
@@ -376,17 +436,20 @@ async def remove_money_command(ctx, member: discord.Member = None, amount: int =
         return
 
     server_id = ctx.guild.id
-    player = get_player(member.id, server_id)
+
+    def remove(player):
+        """Забирає гроші, не нижче 0 (в потоці сховища)."""
+        player.money = max(0, player.money - amount)
+        return player
+    player = await update_player_async(member.id, server_id, remove)
     if player:
-        new_amount = max(0, player["money"] - amount)
-        if set_player_money(member.id, server_id, new_amount):
-            embed = discord.Embed(
-                title=f"💵 Гроші забрані",
-                description=f"Забрано {amount} 💵 у користувача {member.mention}",
-                color=discord.Color.red()
-            )
-            embed.add_field(name="Новий баланс", value=f"**{new_amount:,}** 💵", inline=False)
-            await ctx.send(embed=embed)
+        embed = discord.Embed(
+            title=f"💵 Гроші забрані",
+            description=f"Забрано {amount} 💵 у користувача {member.mention}",
+            color=discord.Color.red()
+        )
+        embed.add_field(name="Новий баланс", value=f"**{player.money:,}** 💵", inline=False)
+        await ctx.send(embed=embed)
     else:
         await ctx.send(f"❌ У користувача {member.mention} немає профілю!")
 
@@ -406,14 +469,19 @@ async def set_level_command(ctx, member: discord.Member = None, level: int = Non
         return
 
     server_id = ctx.guild.id
-    if set_player_level(member.id, server_id, level):
-        player = get_player(member.id, server_id)
+
+    def set_level(player):
+        """Встановлює рівень (в потоці сховища)."""
+        player.level = level
+        return player
+    player = await update_player_async(member.id, server_id, set_level)
+    if player:
         embed = discord.Embed(
             title=f"📊 Рівень змінено",
             description=f"Рівень встановлено на {level} для користувача {member.mention}",
             color=discord.Color.blue()
         )
-        embed.add_field(name="Новий рівень", value=f"**Lv. {player['level']}**", inline=False)
+        embed.add_field(name="Новий рівень", value=f"**Lv. {player.level}**", inline=False)
         await ctx.send(embed=embed)
     else:
         await ctx.send(f"❌ У користувача {member.mention} немає профілю!")
@@ -434,14 +502,19 @@ async def set_click_dps_command(ctx, member: discord.Member = None, amount: int
         return
 
     server_id = ctx.guild.id
-    if set_income_per_click(member.id, server_id, amount):
-        player = get_player(member.id, server_id)
+
+    def set_click(player):
+        """Встановлює дохід за клік (в потоці сховища)."""
+        player.income_per_click = amount
+        return player
+    player = await update_player_async(member.id, server_id, set_click)
+    if player:
         embed = discord.Embed(
             title=f"💸 Дохід за клік змінено",
             description=f"Дохід за клік встановлено на {amount} для користувача {member.mention}",
             color=discord.Color.green()
         )
-        embed.add_field(name="Новий дохід за клік", value=f"**+{player['income_per_click']}** 💵/клік", inline=False)
+        embed.add_field(name="Новий дохід за клік", value=f"**+{player.income_per_click}** 💵/клік", inline=False)
         await ctx.send(embed=embed)
     else:
         await ctx.send(f"❌ У користувача {member.mention} немає профілю!")
@@ -459,18 +532,26 @@ async def reset_command(ctx, member: discord.Member = None):
         return
 
     server_id = ctx.guild.id
-    if reset_player_progress(member.id, server_id):
-        # Скидуємо всі бізнеси гравця
-        reset_player_businesses(member.id, server_id)
-        
-        # Скидуємо казино статистику
-        reset_casino_stats(member.id, server_id)
-        
-        # Скидуємо пасивний дохід на 0
-        set_income_per_sec(member.id, server_id, 0)
-        
-        # Очищуємо активну гру гравця
-        clear_active_game(member.id, server_id, active_games)
+
+    def reset_all():
+        """Скидання всіх модулів - одна транзакція: при помилці не скидається нічого."""
+        with transaction():
+            was_reset = reset_player_progress(member.id, server_id)
+            if was_reset:
+                # Скидуємо всі бізнеси гравця
+                reset_player_businesses(member.id, server_id)
+
+                # Скидуємо казино статистику
+                reset_casino_stats(member.id, server_id)
+
+                # Скидуємо пасивний дохід на 0
+                set_income_per_sec(member.id, server_id, 0)
+        return was_reset
+
+    was_reset = await run_storage(reset_all)
+    if was_reset:
+        # Очищуємо активну гру гравця разом з кешами її меню
+        remove_game((member.id, server_id))
         
         embed = discord.Embed(
             title=f"🔄 Прогрес скинено",
@@ -486,6 +567,33 @@ async def reset_command(ctx, member: discord.Member = None):
     else:
         await ctx.send(f"❌ У користувача {member.mention} немає профілю!")
 
+@bot.command(name="limits")
+async def limits_command(ctx):
+    """Показати статистику ліміту кліків (тільки адмін)."""
+    if OWNER_ID and ctx.author.id != OWNER_ID and ctx.author.id not in admin_ids:
+        await ctx.send("⛔ Ти не маєш доступу до адмін-команд.")
+        return
+
+    embed = discord.Embed(
+        title="🚦 Ліміт кліків",
+        color=COLOR_INFO
+    )
+    embed.add_field(name="✅ Оброблено", value=f"**{click_limiter.allowed:,}**", inline=True)
+    embed.add_field(name="👤 Відкинуто (гравець)", value=f"**{click_limiter.dropped['user']:,}**", inline=True)
+    embed.add_field(name="🏠 Відкинуто (сервер)", value=f"**{click_limiter.dropped['guild']:,}**", inline=True)
+    embed.add_field(
+        name="🖥️ Оновлення меню",
+        value=(
+            f"Редагувань: **{display_stats['edits']:,}** | Без змін: **{display_stats['unchanged']:,}**\n"
+            f"Ліміт каналу: **{display_stats['throttled']:,}** | Відкинуто: **{display_stats['dropped']:,}** | "
+            f"Довгих тіків: **{display_stats['overruns']:,}**\n"
+            f"Активних меню: **{len(active_games):,}** | Знято без активності: **{display_stats['retired']:,}**"
+        ),
+        inline=False
+    )
+    embed.set_footer(text=f"Активних бакетів: {len(click_limiter.users)} гравців, {len(click_limiter.guilds)} серверів")
+    await ctx.send(embed=embed)
+
 @bot.command(name="тест")
 async def test_command(ctx):
     """Перевірити роботу бота."""
@@ -526,15 +634,18 @@ async def help_command(ctx):
         "`!removemoney @user кількість` - забрати гроші\n"
         "`!setlevel @user рівень` - встановити рівень\n"
         "`!setclickdps @user кількість` - встановити дохід за клік\n"
-        "`!reset @user` - скинути прогрес гравця"
+        "`!reset @user` - скинути прогрес гравця\n"
+        "`!limits` - статистика ліміту кліків і оновлення меню"
     )
     embed.add_field(name="🛡️ Команди адмінів", value=admin_cmds, inline=False)
 
     clicker_cmds = (
         "`!start` - створити профіль\n"
         "`!profile` - переглянути профіль\n"
-        "`!top` - ТОП-10 гравців\n"
+        "`!top [money|level|click|business|wins|bet|banka]` - рейтинг гравців (⬅️ ➡️ сторінки)\n"
+        "`!rank` - твоє місце в рейтингу\n"
         "`!clicker` - відкрити гру\n"
+        "`!upgrade [click|idle] [кількість|max]` - купити кілька апгрейдів одразу\n"
         "`!certification` - пройти тест на Негев"
     )
     embed.add_field(name="🎮 Клікер команди", value=clicker_cmds, inline=False)
@@ -590,16 +701,12 @@ admin_ids = load_admins()
 
 # ============ БОТА НАЛАШТУВАННЯ ============
 
-# Для cooldown
-click_cooldowns = {}
-
 @bot.event
 async def on_ready():
     """Бот готовий."""
     print(f"✅ Бот онлайн як {bot.user}")
     # Переконуємось що файл існує
-    if not os.path.exists(DATA_FILE):
-        save_data({"users": {}})
+    await run_storage(flush_data)
     # Синхронізуємо команди
     try:
         synced = await bot.tree.sync()
@@ -621,6 +728,12 @@ async def on_ready():
         print(f"❌ Помилка завантаження казино: {e}")
     # Запускаємо цикл оновлення меню
     update_game_display.start()
+    # Запускаємо запис накопичених кліків
+    if not apply_clicks_loop.is_running():
+        apply_clicks_loop.start()
+    # Запускаємо періодичний запис даних на диск
+    if not flush_storage_loop.is_running():
+        flush_storage_loop.start()
 
 
 # ============ ТЕСТ СЕРТИФІКАЦІЇ ============
@@ -758,7 +871,7 @@ async def show_test_question(user_id):
             embed.set_image(url=CERTIFICATE_IMAGE_URL)
             # Видати сертифікат у базі даних
             guild_id = progress.get("guild_id", 1)
-            issue_certificate(user_id, guild_id)
+            await issue_certificate_async(user_id, guild_id)
         elif percentage >= 80:
             embed.add_field(
                 name="🏆 Результат",
@@ -921,15 +1034,15 @@ class BankaCompleteView(discord.ui.View):
             return
 
         # Скидаємо баночку
-        reset_user_banka(self.user_id, self.server_id)
+        await reset_user_banka_async(self.user_id, self.server_id)
 
         # Отримуємо оновлені дані баночки
-        banka = get_user_banka(self.user_id, self.server_id)
+        banka = await get_user_banka_async(self.user_id, self.server_id)
 
         # Показуємо нову баночку
         embed = discord.Embed(
             title=f"🥛 Баночка молочка {interaction.user.name}",
-            description=f"Прогрес: {get_progress_bar(banka['progress'])} **{banka['progress']}%**\n\nКліки потрібно: 4",
+            description=f"Прогрес: {get_progress_bar(banka.progress)} **{banka.progress}%**\n\nКліки потрібно: 4",
             color=COLOR_INFO
         )
         embed.set_image(url=BANKA_IMAGE_URL)
@@ -958,11 +1071,13 @@ class BankaView(discord.ui.View):
             await interaction.response.send_message("❌ Це не твоя баночка!", ephemeral=True)
             return
 
-        # Додаємо 25% прогресу
-        new_progress = add_progress(self.user_id, self.server_id)
+        remaining = cooldowns.hit("banka", self.user_id, self.server_id)
+        if remaining:
+            await send_cooldown_message(interaction, remaining)
+            return
 
-        # Отримуємо дані баночки
-        banka = get_user_banka(self.user_id, self.server_id)
+        # Додаємо 25% прогресу
+        new_progress = await add_progress_async(self.user_id, self.server_id)
 
         # Якщо не завершено - оновлюємо повідомлення
         if new_progress < 100:
@@ -976,8 +1091,8 @@ class BankaView(discord.ui.View):
             await interaction.response.edit_message(embed=embed, view=self)
         else:
             # Баночка завершена! Додаємо до лічильника
-            add_to_total_completed(self.user_id, self.server_id)
-            total_count = get_total_completed_count(self.user_id, self.server_id)
+            await add_to_total_completed_async(self.user_id, self.server_id)
+            total_count = await get_total_completed_count_async(self.user_id, self.server_id)
             
             embed = discord.Embed(
                 title="✅ Успішно!",
@@ -1003,7 +1118,7 @@ async def start_command(ctx):
     user_id = ctx.author.id
     server_id = ctx.guild.id
 
-    if get_player(user_id, server_id):
+    if await get_player_async(user_id, server_id):
         embed = discord.Embed(
             title=EMOJI_ERROR + " Вже зареєстрований",
             description="У вас вже є профіль на цьому сервері!",
@@ -1012,7 +1127,7 @@ async def start_command(ctx):
         await ctx.send(embed=embed)
         return
 
-    if create_player(user_id, server_id):
+    if await create_player_async(user_id, server_id):
         embed = discord.Embed(
             title=EMOJI_SUCCESS + " Профіль створено!",
             description=f"Ласкаво просимо в гру, {ctx.author.mention}!",
@@ -1043,7 +1158,7 @@ async def profile_command(ctx):
     user_id = ctx.author.id
     server_id = ctx.guild.id
 
-    player = get_player(user_id, server_id)
+    player = await get_player_async(user_id, server_id)
 
     if not player:
         embed = discord.Embed(
@@ -1063,27 +1178,27 @@ async def profile_command(ctx):
 
     embed.add_field(
         name=f"{EMOJI_MONEY} Баланс",
-        value=f"**{player['money']:,}** 💵",
+        value=f"**{player.money:,}** 💵",
         inline=True
     )
     embed.add_field(
         name=f"{EMOJI_LEVEL} Рівень",
-        value=f"**{player['level']}**",
+        value=f"**{player.level}**",
         inline=True
     )
     embed.add_field(
         name=f"{EMOJI_CLOCK} Створено",
-        value=datetime.fromisoformat(player["created_at"]).strftime("%d.%m.%Y"),
+        value=datetime.fromisoformat(player.created_at).strftime("%d.%m.%Y"),
         inline=True
     )
 
     embed.add_field(
         name="💸 Дохід за клік",
-        value=f"**{player['income_per_click']}**",
+        value=f"**{player.income_per_click}**",
         inline=False
     )
 
-    click_upgrade_cost = calculate_upgrade_cost(BASE_CLICK_UPGRADE_COST, player["level"])
+    click_upgrade_cost = calculate_upgrade_cost(BASE_CLICK_UPGRADE_COST, player.level)
 
     embed.add_field(
         name="Вартість Апгрейду (Наступний Рівень)",
@@ -1093,62 +1208,182 @@ async def profile_command(ctx):
 
     await ctx.send(embed=embed)
 
-@bot.command(name="top")
-async def top_command(ctx):
-    """Показати лідербордус сервера."""
+@bot.command(name="upgrade")
+async def upgrade_command(ctx, kind: str = "click", amount: str = "1"):
+    """Купити кілька апгрейдів одразу: !upgrade [click|idle] [кількість|max]."""
+    user_id = ctx.author.id
     server_id = ctx.guild.id
 
-    top_players = get_server_top(server_id, limit=10)
+    kind = kind.lower()
+    buy = {"click": buy_click_upgrades, "idle": buy_idle_upgrades}.get(kind)
+    count = None if amount.lower() == "max" else int(amount) if amount.isdigit() else 0
+    if buy is None or count == 0:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Невірна команда",
+            description="Використання: `!upgrade [click|idle] [кількість|max]`",
+            color=COLOR_ERROR
+        )
+        await ctx.send(embed=embed)
+        return
 
-    if not top_players:
+    if count is not None and count > MAX_BULK_UPGRADES:
         embed = discord.Embed(
-            title=EMOJI_ERROR + " Немає гравців",
-            description="На цьому сервері ще немає гравців!",
-            color=COLOR_WARNING
+            title=EMOJI_ERROR + " Забагато апгрейдів",
+            description=f"За раз можна купити не більше {MAX_BULK_UPGRADES}. Або використай `!upgrade {kind} max`",
+            color=COLOR_ERROR
+        )
+        await ctx.send(embed=embed)
+        return
+
+    # Той самий cooldown, що й у кнопки апгрейду
+    remaining = cooldowns.hit("upgrade", user_id, server_id)
+    if remaining:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Cooldown",
+            description=f"Чекай {round(remaining, 2)}s перед наступною дією!",
+            color=COLOR_ERROR
         )
         await ctx.send(embed=embed)
         return
 
+    # Вартість всіх рівнів рахується разом, а гравець записується один раз
+    result = await update_player_async(
+        user_id, server_id, lambda player: (buy(player, count), player)
+    )
+    if not result:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Немає профілю",
+            description="У вас немає профілю. Використайте `!start`!",
+            color=COLOR_ERROR
+        )
+        await ctx.send(embed=embed)
+        return
+
+    (bought, missing), player = result
+    if missing:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Не вистачає грошей",
+            description=f"Тобі бракує {missing} 💵",
+            color=COLOR_ERROR
+        )
+        await ctx.send(embed=embed)
+        return
+
+    income = f"💸 Дохід за клік: **{player.income_per_click}**" if kind == "click" else \
+        f"{EMOJI_CLOCK} Дохід за секунду: **{player.income_per_sec}**"
     embed = discord.Embed(
-        title=f"{EMOJI_TOP} Топ 10 Гравців - {ctx.guild.name}",
-        description="Лідербордус сервера (тільки гроші)",
-        color=COLOR_INFO
+        title=f"{EMOJI_UPGRADE} Куплено апгрейдів: {bought}",
+        description=f"{income}\n{EMOJI_MONEY} Баланс: **{player.money:,}** 💵",
+        color=COLOR_SUCCESS
     )
+    await ctx.send(embed=embed)
+
+def get_medal(position: int) -> str:
+    """Медаль для місця в рейтингу."""
+    if position == 1:
+        return "🥇"
+    elif position == 2:
+        return "🥈"
+    elif position == 3:
+        return "🥉"
+    return "  "
+
+async def render_leaderboard_page(guild, metric: str, cursor=None, forward: bool = True):
+    """Сторінка рейтингу: (embed, курсор назад, курсор вперед) або None якщо рейтинг порожній.
+
+    Сторінка береться з індексу рейтингу за курсором (без сортування),
+    а готовий embed кешується на LEADERBOARD_CACHE_TTL секунд.
+    """
+    cache_key = (guild.id, metric, cursor, forward)
+    cached = leaderboard_pages.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    board = BOARDS[metric]
+
+    def read_page():
+        """Сторінка рейтингу, гравці її рядків (для грошей) і розмір рейтингу."""
+        start, entries, prev_cursor, next_cursor = board.page(guild.id, cursor, forward, LEADERBOARD_PAGE_SIZE)
+        players = {user_id: get_player(user_id, guild.id) for user_id, _ in entries} if metric == "money" else {}
+        return start, entries, prev_cursor, next_cursor, players, board.size(guild.id)
+
+    start, entries, prev_cursor, next_cursor, players, total = await run_storage(read_page)
+    if not entries:
+        return None
+
+    # Всі імена одним викликом: з кешу, а промахи - паралельно
+    names = await user_resolver.resolve(guild, [user_id for user_id, _ in entries])
 
     leaderboard_text = ""
-    for player in top_players:
-        try:
-            user = await bot.fetch_user(player["user_id"])
-            username = user.name
-        except:
-            username = f"Unknown User ({player['user_id']})"
-
-        if player["position"] == 1:
-            medal = "🥇"
-        elif player["position"] == 2:
-            medal = "🥈"
-        elif player["position"] == 3:
-            medal = "🥉"
+    for position, (user_id, value) in enumerate(entries, start):
+        username = names[user_id] or f"Unknown User ({user_id})"
+        leaderboard_text += f"{get_medal(position)} **{position}. {username}**\n"
+
+        player = players.get(user_id)
+        if player:
+            # Гроші - ті, за якими рахується місце, а не з ще не нарахованим пасивним доходом
+            leaderboard_text += f"   💵 {board.format_value(value)} | Lv. {player.level} | 💸 +{player.income_per_click}/клік\n"
         else:
-            medal = "  "
+            leaderboard_text += f"   {board.title}: **{board.format_value(value)}**\n"
 
-        leaderboard_text += f"{medal} **{player['position']}. {username}**\n"
-        leaderboard_text += f"   💵 {player['money']:,} | Lv. {player['level']} | 💸 +{player['income_per_click']}/клік\n"
+    embed = discord.Embed(
+        title=f"{EMOJI_TOP} Топ Гравців - {board.title} - {guild.name}",
+        description=leaderboard_text,
+        color=COLOR_INFO
+    )
+    last_position = start + len(entries) - 1
+    footer = f"Місця {start}-{last_position} з {total} | Рейтинги: " + ", ".join(BOARDS)
+    if metric == "money":
+        footer += " | Пасивний дохід враховується з наступною дією гравця"
+    embed.set_footer(text=footer)
 
-    embed.description = leaderboard_text
-    embed.set_footer(text="Топ 10 гравців на цьому сервері")
+    page = (embed, prev_cursor, next_cursor)
 
-    await ctx.send(embed=embed)
+    # Прибираємо прострочені сторінки, щоб кеш не ріс
+    now = time.monotonic()
+    for key in [key for key, (expires_at, _) in leaderboard_pages.items() if expires_at <= now]:
+        del leaderboard_pages[key]
+    leaderboard_pages[cache_key] = (now + LEADERBOARD_CACHE_TTL, page)
+    return page
 
-@bot.command(name="clicker")
-async def clicker_command(ctx):
-    """Показати інтерфейс гри."""
+@bot.command(name="top")
+async def top_command(ctx, metric: str = "money"):
+    """Показати лідербордус сервера (за грошима або іншим показником) з гортанням сторінок."""
+    metric = metric.lower()
+    if metric not in BOARDS:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Невідомий рейтинг",
+            description="Доступні рейтинги: " + ", ".join(f"`{name}`" for name in BOARDS),
+            color=COLOR_ERROR
+        )
+        await ctx.send(embed=embed)
+        return
+
+    page = await render_leaderboard_page(ctx.guild, metric)
+
+    if page is None:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Немає гравців",
+            description="На цьому сервері ще немає гравців!",
+            color=COLOR_WARNING
+        )
+        await ctx.send(embed=embed)
+        return
+
+    embed, prev_cursor, next_cursor = page
+    render = lambda guild, cursor, forward: render_leaderboard_page(guild, metric, cursor, forward)
+    view = PageView(ctx.author.id, render, prev_cursor, next_cursor)
+    await ctx.send(embed=embed, view=view)
+
+@bot.command(name="rank")
+async def rank_command(ctx):
+    """Показати місце гравця в рейтингу і сусідів вище/нижче."""
     user_id = ctx.author.id
     server_id = ctx.guild.id
 
-    player = get_player(user_id, server_id)
+    position, total = await get_player_rank_async(user_id, server_id)
 
-    if not player:
+    if position is None:
         embed = discord.Embed(
             title=EMOJI_ERROR + " Немає профілю",
             description="У вас немає профілю. Використайте `!start`!",
@@ -1157,38 +1392,49 @@ async def clicker_command(ctx):
         await ctx.send(embed=embed)
         return
 
+    neighbours = await get_rank_around_async(user_id, server_id, radius=2)
+    names = await user_resolver.resolve(ctx.guild, [player["user_id"] for player in neighbours])
+
+    rank_text = ""
+    for player in neighbours:
+        username = names[player["user_id"]] or f"Unknown User ({player['user_id']})"
+        marker = "👉" if player["user_id"] == user_id else "  "
+        rank_text += f"{marker} **{player['position']}. {username}**\n"
+        rank_text += f"   💵 {player['money']:,} | Lv. {player['level']}\n"
+
     embed = discord.Embed(
-        title=f"{EMOJI_CLICK} Гра Клікер - {ctx.author.name}",
+        title=f"{EMOJI_TOP} Твоє місце: #{position} з {total}",
+        description=rank_text,
         color=COLOR_INFO
     )
-    embed.add_field(
-        name=f"{EMOJI_MONEY} Баланс",
-        value=f"**{player['money']:,}** 💵",
-        inline=True
-    )
-    embed.add_field(
-        name=f"{EMOJI_LEVEL} Рівень",
-        value=f"**{player['level']}**",
-        inline=True
-    )
-    embed.add_field(
-        name="💸 Дохід за клік",
-        value=f"**{player['income_per_click']}**",
-        inline=True
-    )
+    embed.set_footer(text=f"Рейтинг за грошима - {ctx.guild.name} | Пасивний дохід враховується з наступною дією гравця")
 
-    # Додаємо прибиль від бізнесу
-    business_profit = get_total_profit(user_id, server_id)
-    if business_profit > 0:
-        embed.add_field(
-            name="💼 Прибиль від бізнесу",
-            value=f"**{business_profit:.2f}** 💵 в 15 секунд",
-            inline=False
+    await ctx.send(embed=embed)
+
+@bot.command(name="clicker")
+async def clicker_command(ctx):
+    """Показати інтерфейс гри."""
+    user_id = ctx.author.id
+    server_id = ctx.guild.id
+
+    player = await get_player_async(user_id, server_id)
+
+    if not player:
+        embed = discord.Embed(
+            title=EMOJI_ERROR + " Немає профілю",
+            description="У вас немає профілю. Використайте `!start`!",
+            color=COLOR_ERROR
         )
+        await ctx.send(embed=embed)
+        return
+
+    embed = await render_game_embed(user_id, server_id, ctx.author.name)
 
     view = GameView(user_id, server_id)
 
     message = await ctx.send(embed=embed, view=view)
+    mark_game_pushed((user_id, server_id), message, embed)
+    touch_game((user_id, server_id))
 
     # Зберігаємо посилання на повідомлення для оновлення
     active_games[(user_id, server_id)] = (message, ctx.channel)
@@ -1200,17 +1446,17 @@ async def banochka_command(ctx):
     server_id = ctx.guild.id
 
     # Отримуємо дані баночки
-    banka = get_user_banka(user_id, server_id)
+    banka = await get_user_banka_async(user_id, server_id)
 
     # Якщо баночка вже завершена, скидаємо її для нової гри
-    if banka['completed']:
-        reset_user_banka(user_id, server_id)
-        banka = get_user_banka(user_id, server_id)
+    if banka.completed:
+        await reset_user_banka_async(user_id, server_id)
+        banka = await get_user_banka_async(user_id, server_id)
 
     # Створюємо embed
     embed = discord.Embed(
         title=f"🥛 Баночка молочка {ctx.author.name}",
-        description=f"Прогрес: {get_progress_bar(banka['progress'])} **{banka['progress']}%**\n\nКліки потрібно: 4",
+        description=f"Прогрес: {get_progress_bar(banka.progress)} **{banka.progress}%**\n\nКліки потрібно: 4",
         color=COLOR_INFO
     )
 
@@ -1226,8 +1472,8 @@ async def stats_banochka_command(ctx):
     server_id = ctx.guild.id
 
     # Отримуємо дані баночки
-    banka = get_user_banka(user_id, server_id)
-    total_completed = get_total_completed_count(user_id, server_id)
+    banka = await get_user_banka_async(user_id, server_id)
+    total_completed = await get_total_completed_count_async(user_id, server_id)
 
     # Створюємо embed зі статистикою
     embed = discord.Embed(
@@ -1243,13 +1489,13 @@ async def stats_banochka_command(ctx):
 
     embed.add_field(
         name="📈 Поточний прогрес",
-        value=f"{get_progress_bar(banka['progress'])} **{banka['progress']}%**",
+        value=f"{get_progress_bar(banka.progress)} **{banka.progress}%**",
         inline=False
     )
 
     embed.add_field(
         name="⏰ Перша баночка створена",
-        value=datetime.fromisoformat(banka['created_at']).strftime("%d.%m.%Y %H:%M"),
+        value=datetime.fromisoformat(banka.created_at).strftime("%d.%m.%Y %H:%M"),
         inline=False
     )
 
@@ -1265,8 +1511,178 @@ async def stats_banochka_command(ctx):
 
     await ctx.send(embed=embed)
 
+# ============ ЕКРАН ГРИ ============
+
+async def render_game_embed(user_id: int, server_id: int, name: str | None = None):
+    """Embed екрану клікера або None якщо профілю немає.
+
+    Екран будується з гравця і прибилі від бізнесів і запам'ятовується
+    разом з їх версіями: поки версії ті самі, повертається той самий embed,
+    а прибиль перераховується лише після зміни бізнесів.
+    name=None - ім'я з попереднього екрану (для фонового оновлення).
+    """
+    key = (user_id, server_id)
+    cached = game_embeds.get(key)
+    if name is None:
+        name = cached[2] if cached else None
+
+    player_version, business_version = await run_storage(
+        lambda: (get_player_version(user_id, server_id), get_businesses_version(user_id, server_id))
+    )
+    if cached and cached[:3] == (player_version, business_version, name):
+        return cached[4]
+
+    player = await get_player_async(user_id, server_id)
+    if not player:
+        game_embeds.pop(key, None)
+        return None
+
+    if cached and cached[1] == business_version:
+        business_profit = cached[3]
+    else:
+        business_profit = await get_total_profit_async(user_id, server_id)
+
+    embed = discord.Embed(
+        title=f"{EMOJI_CLICK} Гра Клікер - {name}" if name else f"{EMOJI_CLICK} Гра Клікер",
+        color=COLOR_INFO
+    )
+    embed.add_field(
+        name=f"{EMOJI_MONEY} Баланс",
+        value=f"**{player.money:,}** 💵",
+        inline=True
+    )
+    embed.add_field(
+        name=f"{EMOJI_LEVEL} Рівень",
+        value=f"**{player.level}**",
+        inline=True
+    )
+    embed.add_field(
+        name="💸 Дохід за клік",
+        value=f"**{player.income_per_click}**",
+        inline=True
+    )
+    if player.income_per_sec > 0:
+        embed.add_field(
+            name=f"{EMOJI_CLOCK} Дохід за секунду",
+            value=f"**{player.income_per_sec}**",
+            inline=True
+        )
+
+    # Додаємо прибиль від бізнесу
+    if business_profit > 0:
+        embed.add_field(
+            name="💼 Прибиль від бізнесу",
+            value=f"**{business_profit:.2f}** 💵 в 15 секунд",
+            inline=False
+        )
+
+    game_embeds[key] = (player_version, business_version, name, business_profit, embed)
+    return embed
+
+def touch_game(key: tuple, message=None, channel=None):
+    """Гравець взаємодіяв з меню: оновлювати його знову кожен тік.
+
+    Меню, зняте з оновлення через неактивність, з message і channel
+    повертається в розклад (якщо гравець не відкрив нове меню).
+    """
+    if message is not None and key not in active_games:
+        active_games[key] = (message, channel)
+    game_activity[key] = (time.monotonic(), 0)
+
+def game_refresh_interval(idle: float) -> float:
+    """Інтервал оновлення меню, до якого гравець не торкався idle секунд."""
+    backoffs = min(int(idle // DISPLAY_BACKOFF_STEP), 16)
+    return min(DISPLAY_MAX_INTERVAL, DISPLAY_TICK * 2 ** backoffs)
+
+def remove_game(key: tuple):
+    """Прибирає гру з активних і всі її кеші."""
+    active_games.pop(key, None)
+    game_embeds.pop(key, None)
+    game_pushed.pop(key, None)
+    game_activity.pop(key, None)
+
+def mark_game_pushed(key: tuple, message, embed):
+    """Запам'ятовує, що показано в повідомленні гри."""
+    game_pushed[key] = (message.id, embed, embed.to_dict())
+
+def game_changed(key: tuple, message, embed) -> bool:
+    """Чи відрізняється embed від показаного в повідомленні гри."""
+    pushed = game_pushed.get(key)
+    if pushed and pushed[0] == message.id:
+        # Той самий embed з кешу - стан не змінювався, порівнювати вміст не треба
+        if pushed[1] is embed or pushed[2] == embed.to_dict():
+            return False
+    return True
+
+async def push_game_embed(key: tuple, message, embed) -> bool:
+    """Редагує повідомлення гри, лише якщо показане там відрізняється. True - редаговано."""
+    if not game_changed(key, message, embed):
+        return False
+    await message.edit(embed=embed)
+    mark_game_pushed(key, message, embed)
+    return True
+
 # ============ КНОПКИ ============
 
+async def send_cooldown_message(interaction: discord.Interaction, remaining: float):
+    """Повідомляє гравцю, скільки ще чекати до наступної дії."""
+    embed = discord.Embed(
+        title=EMOJI_ERROR + " Cooldown",
+        description=f"Чекай {round(remaining, 2)}s перед наступною дією!",
+        color=COLOR_ERROR
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+class PageView(discord.ui.View):
+    """Вьюха з кнопками гортання сторінок (рейтинги, списки).
+
+    render(guild, курсор, вперед) - корутина, що повертає
+    (embed, курсор назад, курсор вперед) або None.
+    """
+
+    def __init__(self, user_id: int, render, prev_cursor, next_cursor):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.render = render
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.update_buttons()
+
+    def update_buttons(self):
+        """Вимикає кнопки, якщо сторінки в ту сторону немає."""
+        self.prev_button.disabled = self.prev_cursor is None
+        self.next_button.disabled = self.next_cursor is None
+
+    @discord.ui.button(label="Назад", emoji="⬅️", style=discord.ButtonStyle.secondary)
+    async def prev_button(self, interaction: discord.Interaction, item: discord.ui.Button):
+        """Попередня сторінка."""
+        await self.turn_page(interaction, self.prev_cursor, forward=False)
+
+    @discord.ui.button(label="Далі", emoji="➡️", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, item: discord.ui.Button):
+        """Наступна сторінка."""
+        await self.turn_page(interaction, self.next_cursor, forward=True)
+
+    async def turn_page(self, interaction: discord.Interaction, cursor, forward: bool):
+        """Показує сторінку від курсора."""
+        if interaction.user.id != self.user_id:
+            embed = discord.Embed(
+                title=EMOJI_ERROR + " Не твоя кнопка",
+                description="Ти не можеш користуватись кнопкою іншої людини!",
+                color=COLOR_ERROR
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        page = await self.render(interaction.guild, cursor, forward)
+        if page is None:
+            await interaction.response.defer()
+            return
+
+        embed, self.prev_cursor, self.next_cursor = page
+        self.update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
 class GameView(discord.ui.View):
     """Вьюха з кнопками гри."""
 
@@ -1295,23 +1711,18 @@ class GameView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        # Перевірка cooldown
-        key = (user_id, server_id)
-        current_time = time.time()
+        # Гравець дивиться на меню - воно знову оновлюється часто
+        touch_game((user_id, server_id), interaction.message, interaction.channel)
 
-        if key in click_cooldowns:
-            last_click = click_cooldowns[key]
-            if current_time - last_click < CLICK_COOLDOWN:
-                remaining = round(CLICK_COOLDOWN - (current_time - last_click), 2)
-                embed = discord.Embed(
-                    title=EMOJI_ERROR + " Cooldown",
-                    description=f"Чекай {remaining}s перед наступним кліком!",
-                    color=COLOR_ERROR
-                )
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                return
+        # Ліміт кліків (перевіряється до першого await, щоб паралельний клік його бачив).
+        # Зайвий клік лише підтверджується без відповіді - без embed і редагування
+        current_time = time.time()
+        if not click_limiter.allow(user_id, server_id):
+            await interaction.response.defer()
+            return
 
-        player = get_player(user_id, server_id)
+        # Клік лише рахується в пам'яті, а в таблицю кліки йдуть пачкою (apply_clicks_loop)
+        player = await queue_click_async(user_id, server_id, current_time)
         if not player:
             embed = discord.Embed(
                 title=EMOJI_ERROR + " Немає профілю",
@@ -1321,44 +1732,12 @@ class GameView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        earned = player["income_per_click"]
-        add_money(user_id, server_id, earned)
-        update_click_time(user_id, server_id, current_time)
-        click_cooldowns[key] = current_time
-
-        player = get_player(user_id, server_id)
-
-        embed = discord.Embed(
-            title=f"{EMOJI_CLICK} Гра Клікер - {interaction.user.name}",
-            color=COLOR_INFO
-        )
-        embed.add_field(
-            name=f"{EMOJI_MONEY} Баланс",
-            value=f"**{player['money']:,}** 💵",
-            inline=True
-        )
-        embed.add_field(
-            name="📊 Рівень Кліку",
-            value=f"**{player['income_per_click']}**",
-            inline=True
-        )
-        embed.add_field(
-            name="💸 Дохід за клік",
-            value=f"**{player['income_per_click']}**",
-            inline=True
-        )
-
-        # Додаємо прибиль від бізнесу
-        business_profit = get_total_profit(user_id, server_id)
-        if business_profit > 0:
-            embed.add_field(
-                name="💼 Прибиль від бізнесу",
-                value=f"**{business_profit:.2f}** 💵 в 15 секунд",
-                inline=False
-            )
+        embed = await render_game_embed(user_id, server_id, interaction.user.name)
 
         await interaction.response.defer()
         await interaction.message.edit(embed=embed)
+        channel_edits.take(interaction.channel_id, time.monotonic())  # Ці редагування теж у ліміті каналу
+        mark_game_pushed((user_id, server_id), interaction.message, embed)
 
     @discord.ui.button(
         label="Апгрейд Клік",
@@ -1368,6 +1747,20 @@ class GameView(discord.ui.View):
     )
     async def upgrade_click_button(self, interaction: discord.Interaction, item: discord.ui.Button):
         """Кнопка апгрейду кліка."""
+        await self.buy_upgrades(interaction, 1)
+
+    @discord.ui.button(
+        label="Макс",
+        emoji=EMOJI_UPGRADE,
+        style=discord.ButtonStyle.primary,
+        custom_id="btn_upgrade_click_max"
+    )
+    async def upgrade_click_max_button(self, interaction: discord.Interaction, item: discord.ui.Button):
+        """Кнопка апгрейду кліка на всі гроші."""
+        await self.buy_upgrades(interaction, None)
+
+    async def buy_upgrades(self, interaction: discord.Interaction, count: int | None):
+        """Купує count апгрейдів кліка (None - скільки вистачить грошей) і оновлює екран."""
         user_id = interaction.user.id
         server_id = interaction.guild.id
 
@@ -1380,8 +1773,18 @@ class GameView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        player = get_player(user_id, server_id)
-        if not player:
+        touch_game((user_id, server_id), interaction.message, interaction.channel)
+
+        remaining = cooldowns.hit("upgrade", user_id, server_id)
+        if remaining:
+            await send_cooldown_message(interaction, remaining)
+            return
+
+        # Перевірка грошей і всі рівні - в одній транзакції гравця (один запис)
+        result = await update_player_async(
+            user_id, server_id, lambda player: buy_click_upgrades(player, count)
+        )
+        if not result:
             embed = discord.Embed(
                 title=EMOJI_ERROR + " Немає профілю",
                 description="У тебе немає профілю!",
@@ -1390,111 +1793,106 @@ class GameView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        cost = calculate_upgrade_cost(BASE_CLICK_UPGRADE_COST, player["level"])
-
-        if player["money"] < cost:
+        bought, missing = result
+        if missing:
             embed = discord.Embed(
                 title=EMOJI_ERROR + " Не вистачає грошей",
-                description=f"Тобі бракує {cost - player['money']} 💵",
+                description=f"Тобі бракує {missing} 💵",
                 color=COLOR_ERROR
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        if upgrade_income_per_click(user_id, server_id):
-            player = get_player(user_id, server_id)
+        embed = await render_game_embed(user_id, server_id, interaction.user.name)
 
-            embed = discord.Embed(
-                title=f"{EMOJI_CLICK} Гра Клікер - {interaction.user.name}",
-                color=COLOR_INFO
-            )
-            embed.add_field(
-                name=f"{EMOJI_MONEY} Баланс",
-                value=f"**{player['money']:,}** 💵",
-                inline=True
-            )
-            embed.add_field(
-                name="📊 Рівень Кліку",
-                value=f"**{player['income_per_click']}**",
-                inline=True
-            )
-            embed.add_field(
-                name="💸 Дохід за клік",
-                value=f"**{player['income_per_click']}**",
-                inline=True
-            )
-
-            # Додаємо прибиль від бізнесу
-            business_profit = get_total_profit(user_id, server_id)
-            if business_profit > 0:
-                embed.add_field(
-                    name="💼 Прибиль від бізнесу",
-                    value=f"**{business_profit:.2f}** 💵 в 15 секунд",
-                    inline=False
-                )
-
-            await interaction.response.defer()
-            await interaction.message.edit(embed=embed)
-        else:
-            embed = discord.Embed(
-                title=EMOJI_ERROR + " Помилка Апгрейду",
-                description="Щось пішло не так!",
-                color=COLOR_ERROR
-            )
-            await interaction.response.defer()
-            await interaction.message.edit(embed=embed)
+        await interaction.response.defer()
+        await interaction.message.edit(embed=embed)
+        channel_edits.take(interaction.channel_id, time.monotonic())  # Ці редагування теж у ліміті каналу
+        mark_game_pushed((user_id, server_id), interaction.message, embed)
 
 # ============ ФОНОВИЙ ЦИКЛ (ОНОВЛЕННЯ МЕНЮ) ============
 
-@tasks.loop(seconds=2)
+async def refresh_game(key: tuple, message, channel, semaphore: asyncio.Semaphore, deadline: float) -> bool:
+    """Оновлює одне меню клікера. Повертає False, якщо гру треба прибрати з активних."""
+    async with semaphore:
+        if time.monotonic() > deadline:
+            # Тік уже закінчився - наступний тік покаже свіжіший стан
+            display_stats["dropped"] += 1
+            return True
+        try:
+            embed = await render_game_embed(*key)
+            if not embed:
+                return False
+            if not game_changed(key, message, embed):
+                display_stats["unchanged"] += 1
+                return True
+            # Бюджет редагувань каналу: без токена чекаємо наступного тіку
+            now = time.monotonic()
+            if not channel_edits.peek(channel.id, now):
+                display_stats["throttled"] += 1
+                return True
+            channel_edits.take(channel.id, now)
+            await push_game_embed(key, message, embed)
+            display_stats["edits"] += 1
+            return True
+        except Exception as e:
+            # Якщо помилка - видаляємо гру з активних
+            return False
+
+@tasks.loop(seconds=DISPLAY_TICK)
 async def update_game_display():
-    """Оновлює меню клікера в реальному часі з інформацією про прибиль від бізнесу."""
+    """Оновлює меню клікера в реальному часі з інформацією про прибиль від бізнесу.
+
+    Меню, з якими гравець щойно взаємодіяв, оновлюються кожен тік, а без
+    взаємодії - все рідше (game_refresh_interval) і знімаються після
+    DISPLAY_GAME_TTL. Меню оновлюються паралельно (не більше
+    DISPLAY_CONCURRENCY редагувань одночасно) в межах ліміту редагувань
+    кожного каналу. Робота, що не встигла за DISPLAY_TICK, відкидається,
+    а не накопичується.
+    """
     try:
-        games_to_remove = []
-        for (user_id, server_id), (message, channel) in active_games.items():
-            try:
-                player = get_player(user_id, server_id)
-                if player:
-                    embed = discord.Embed(
-                        title=f"{EMOJI_CLICK} Гра Клікер",
-                        color=COLOR_INFO
-                    )
-                    embed.add_field(
-                        name=f"{EMOJI_MONEY} Баланс",
-                        value=f"**{player['money']:,}** 💵",
-                        inline=True
-                    )
-                    embed.add_field(
-                        name=f"{EMOJI_LEVEL} Рівень",
-                        value=f"**{player['level']}**",
-                        inline=True
-                    )
-                    embed.add_field(
-                        name="💸 Дохід за клік",
-                        value=f"**{player['income_per_click']}**",
-                        inline=True
-                    )
+        started_at = time.monotonic()
+        deadline = started_at + DISPLAY_TICK
+        semaphore = asyncio.Semaphore(DISPLAY_CONCURRENCY)
+        channel_edits.prune(started_at)  # Бакети каналів, що вже поповнились, не тримаємо
+
+        # Розклад: які меню вже пора оновити, а які давно без взаємодії - зняти
+        due = []
+        for key, (message, channel) in list(active_games.items()):
+            last_interaction, last_refresh = game_activity.setdefault(key, (started_at, 0))
+            idle = started_at - last_interaction
+            if idle > DISPLAY_GAME_TTL:
+                remove_game(key)
+                display_stats["retired"] += 1
+            # Пів тіку запасу: цикл запускається не рівно кожні DISPLAY_TICK секунд
+            elif started_at - last_refresh >= game_refresh_interval(idle) - DISPLAY_TICK / 2:
+                due.append((last_interaction, key, message, channel))
+        for key in [key for key in game_activity if key not in active_games]:
+            del game_activity[key]  # Гру прибрали в іншому місці (наприклад, !reset)
+
+        # Спершу найсвіжіші меню: вони першими отримують місце під semaphore і бюджет каналу
+        due.sort(key=lambda entry: entry[0], reverse=True)
+        tasks_by_key = {}
+        for last_interaction, key, message, channel in due:
+            game_activity[key] = (last_interaction, started_at)
+            task = asyncio.create_task(refresh_game(key, message, channel, semaphore, deadline))
+            tasks_by_key[task] = (key, message)
+        if not tasks_by_key:
+            return
 
-                    # Додаємо загальну прибиль від всіх бізнесів
-                    business_profit = get_total_profit(user_id, server_id)
-                    if business_profit > 0:
-                        embed.add_field(
-                            name="💼 Прибиль від бізнесу",
-                            value=f"**{business_profit:.2f}** 💵 в 15 секунд",
-                            inline=False
-                        )
-
-                    await message.edit(embed=embed)
-                else:
-                    games_to_remove.append((user_id, server_id))
-            except Exception as e:
-                # Якщо помилка - видаляємо гру з активних
-                games_to_remove.append((user_id, server_id))
-
-        # Видаляємо неактивні ігри
-        for key in games_to_remove:
-            if key in active_games:
-                del active_games[key]
+        done, pending = await asyncio.wait(tasks_by_key, timeout=DISPLAY_TICK)
+        if pending:
+            # Тік не вклався в інтервал - незавершені оновлення скасовуємо
+            display_stats["overruns"] += 1
+            display_stats["dropped"] += len(pending)
+            for task in pending:
+                task.cancel()
+
+        # Видаляємо неактивні ігри (якщо за цей час гравець не відкрив нове меню)
+        for task in done:
+            key, message = tasks_by_key[task]
+            if task.result() is False and active_games.get(key, (None,))[0] is message:
+                remove_game(key)
 
     except Exception as e:
         print(f"❌ Помилка в оновленні меню: {e}")
@@ -1504,9 +1902,23 @@ async def before_update_game_display():
     """Чекає коли бот буде готовий перед стартом циклу."""
     await bot.wait_until_ready()
 
+# ============ ФОНОВИЙ ЦИКЛ (ЗАПИС ДАНИХ) ============
+
+@tasks.loop(seconds=CLICK_BATCH_INTERVAL)
+async def apply_clicks_loop():
+    """Записує накопичені кліки гравців у таблицю однією пачкою."""
+    await apply_pending_clicks_async()
+
+@tasks.loop(seconds=FLUSH_INTERVAL)
+async def flush_storage_loop():
+    """Записує накопичені зміни гравців на диск."""
+    await flush_all_async()
+
 # ============ ЗАПУСК БОТА ============
 
 if __name__ == "__main__":
+    # Битий файл даних зупиняє запуск: інакше бот стартував би з порожніми даними і перезаписав їх
+    load_all()
     bot.run(TOKEN)
 
 
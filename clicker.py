@@ -3,17 +3,53 @@
 Всі функції роботи з гравцями та база даних
 """
 
-import os
-import json
+import copy
+import math
+import time
+import atexit
+from contextlib import contextmanager
 from datetime import datetime
 
+from storage import open_table, lock, RecordVersions
+from models import Player
+from ranking import register_board, SortedIndex
+
 # ============ JSON БД ============
 DATA_FILE = "game_data.json"
 
+# Таблиця гравців (бекенд вибирається в storage.STORAGE_BACKEND)
+_players = open_table(
+    "players", DATA_FILE, root="users", sep="-", columns=("money",),
+    decode=Player.from_dict, encode=Player.to_dict
+)
+
+# Версії гравців для кешу готових екранів гри
+_player_versions = RecordVersions(_players)
+
+# Рейтинги гравців по серверах (оновлюються при кожній зміні гравця)
+_money_board = register_board("money", _players, lambda player: player.money, "💵 Гроші")
+register_board("level", _players, lambda player: player.level, "📊 Рівень")
+register_board("click", _players, lambda player: player.income_per_click, "💸 Дохід за клік")
+
+# Сертифіковані гравці по серверах, від найстаршого сертифіката
+_certified = SortedIndex(
+    _players, lambda player: (player.certificate_date or "") if player.has_certificate else None
+)
+
+# Кліки, ще не записані в таблицю: {(user_id, server_id): [кількість, час останнього кліка]}
+# Застосовуються пачкою apply_pending_clicks() або перед будь-якою зміною гравця
+_pending_clicks = {}
+CLICK_BATCH_INTERVAL = 2  # Секунди між записами накопичених кліків
+
+# Пасивний дохід нараховується лише при читанні або зміні гравця,
+# але не більше ніж за IDLE_CATCH_UP_CAP секунд відсутності
+IDLE_CATCH_UP_CAP = 8 * 60 * 60
+
 # ============ КОНФІГ АПГРЕЙДІВ ============
 BASE_CLICK_UPGRADE_COST = 50
 BASE_IDLE_UPGRADE_COST = 100
 UPGRADE_MULTIPLIER = 1.2  # 20% збільшення вартості на кожен рівень
+MAX_BULK_UPGRADES = 1000  # Максимум апгрейдів, замовлених одним числом (ціна росте як 1.2^n)
 
 def calculate_upgrade_cost(base_cost: int, level: int) -> int:
     """Розраховує вартість апгрейду на основі рівня гравця.
@@ -21,20 +57,45 @@ def calculate_upgrade_cost(base_cost: int, level: int) -> int:
     """
     return int(base_cost * (UPGRADE_MULTIPLIER ** (level - 1)))
 
+def bulk_upgrade_cost(base_cost: int, level: int, count: int) -> int:
+    """Вартість count апгрейдів поспіль від рівня level.
+
+    Формула суми геометричної прогресії: base_cost * 1.2^(level-1) * (1.2^count - 1) / 0.2,
+    округлена вниз один раз. Для одного апгрейду дорівнює calculate_upgrade_cost.
+    """
+    first = base_cost * UPGRADE_MULTIPLIER ** (level - 1)
+    return int(first * ((UPGRADE_MULTIPLIER ** count - 1) / (UPGRADE_MULTIPLIER - 1)))
+
+def max_affordable_upgrades(base_cost: int, level: int, money: float) -> int:
+    """Скільки апгрейдів поспіль від рівня level можна купити за money.
+
+    Кількість береться з формули суми геометричної прогресії:
+    first * (1.2^n - 1) / 0.2 <= money, а потім уточнюється через bulk_upgrade_cost,
+    бо логарифм і округлення вниз можуть зсунути межу на крок.
+    """
+    if money < calculate_upgrade_cost(base_cost, level):
+        return 0
+    first = base_cost * UPGRADE_MULTIPLIER ** (level - 1)
+    count = max(1, int(math.log(1 + money * (UPGRADE_MULTIPLIER - 1) / first, UPGRADE_MULTIPLIER)))
+    # Похибка float і округлення - підправляємо на крок-два
+    while bulk_upgrade_cost(base_cost, level, count + 1) <= money:
+        count += 1
+    while count > 0 and bulk_upgrade_cost(base_cost, level, count) > money:
+        count -= 1
+    return count
+
 def load_data():
-    """Завантажує дані з JSON. Створює порожнистий файл якщо його немає."""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return {"users": {}}
-    return {"users": {}}
+    """Повертає документ гравців з кешу в пам'яті."""
+    return _players.document()
 
 def save_data(data):
-    """Зберігає дані у JSON."""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Замінює документ гравців у пам'яті. На диск він потрапить при flush_data()."""
+    _players.replace(data)
+
+def flush_data():
+    """Записує змінені дані гравців на диск."""
+    apply_pending_clicks()
+    _players.flush()
 
 def get_player_key(user_id: int, server_id: int) -> str:
     """Генерує ключ гравця у форматі 'user_id-server_id'."""
@@ -42,183 +103,301 @@ def get_player_key(user_id: int, server_id: int) -> str:
 
 def create_player(user_id: int, server_id: int) -> bool:
     """Створює профіль гравця. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key in data["users"]:
+    if _players.get(user_id, server_id) is not None:
         return False  # Вже існує
 
-    data["users"][key] = {
-        "user_id": user_id,
-        "server_id": server_id,
-        "money": 0,
-        "income_per_click": 1,
-        "income_per_sec": 0,
-        "level": 1,
-        "last_click_time": 0,
-        "created_at": datetime.now().isoformat(),
-        "has_certificate": False,
-        "certificate_date": None
-    }
-
-    save_data(data)
+    _players.put(user_id, server_id, Player(
+        user_id=user_id,
+        server_id=server_id,
+        created_at=datetime.now().isoformat(),
+        last_settled=time.time()
+    ))
     return True
 
-def get_player(user_id: int, server_id: int) -> dict | None:
-    """Отримує дані гравця."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-    return data["users"].get(key)
+def get_player(user_id: int, server_id: int) -> Player | None:
+    """Отримує дані гравця (разом з ще не записаними кліками і пасивним доходом)."""
+    with lock:
+        player = _players.get(user_id, server_id)
+        if player is None:
+            return None
+        pending = _pending_clicks.get((user_id, server_id))
+        now = time.time()
+        if pending is None and not _idle_seconds(player, now):
+            return player
+        player = copy.copy(player)
+        if pending is not None:
+            _add_clicks(player, *pending)
+        _settle_idle(player, now)
+        return player
+
+def get_player_version(user_id: int, server_id: int) -> tuple:
+    """Версія гравця, що бачить get_player: змінюється з кожною зміною, новим кліком або секундою пасивного доходу."""
+    with lock:
+        player = _players.get(user_id, server_id)
+        pending = _pending_clicks.get((user_id, server_id))
+        idle_seconds = _idle_seconds(player, time.time()) if player is not None else 0
+        return _player_versions.version(user_id, server_id), pending[0] if pending else 0, idle_seconds
+
+# ============ ПАСИВНИЙ ДОХІД ============
+
+def _idle_seconds(player: Player, now: float) -> int:
+    """Скільки повних секунд пасивного доходу ще не нараховано (з обмеженням)."""
+    if player.income_per_sec <= 0 or not player.last_settled:
+        return 0
+    return int(min(now - player.last_settled, IDLE_CATCH_UP_CAP))
+
+def _settle_idle(player: Player, now: float):
+    """Нараховує пасивний дохід з last_settled до now."""
+    if not player.last_settled or player.income_per_sec <= 0:
+        # Доходу не було - відлік починається зараз (старі профілі теж)
+        player.last_settled = now
+        return
+    if now - player.last_settled > IDLE_CATCH_UP_CAP:
+        player.last_settled = now - IDLE_CATCH_UP_CAP  # Довша відсутність не оплачується
+    seconds = int(now - player.last_settled)
+    player.money += player.income_per_sec * seconds
+    player.last_settled += seconds  # Неповна секунда лишається на наступний раз
+
+# ============ НАКОПИЧЕННЯ КЛІКІВ ============
+
+def _add_clicks(player: Player, count: int, last_click_time: float):
+    """Нараховує гравцю count кліків."""
+    player.money += player.income_per_click * count
+    player.last_click_time = max(player.last_click_time, last_click_time)
+
+def queue_click(user_id: int, server_id: int, timestamp: float) -> Player | None:
+    """Рахує клік в пам'яті без запису в таблицю.
+
+    Повертає гравця з урахуванням усіх накопичених кліків (для показу)
+    або None якщо профілю немає. Дохід за клік не може змінитись, поки
+    клік чекає: кожна зміна гравця спершу застосовує його кліки.
+    """
+    with lock:
+        if _players.get(user_id, server_id) is None:
+            return None
+        pending = _pending_clicks.setdefault((user_id, server_id), [0, timestamp])
+        pending[0] += 1
+        pending[1] = timestamp
+        return get_player(user_id, server_id)
+
+def _settle_clicks(user_id: int, server_id: int):
+    """Записує накопичені кліки одного гравця в таблицю."""
+    pending = _pending_clicks.pop((user_id, server_id), None)
+    if pending is None:
+        return
+    player = _players.get(user_id, server_id)
+    if player is None:
+        return  # Профіль видалено - кліки нікуди нараховувати
+    player = copy.copy(player)
+    _settle_idle(player, time.time())  # Пасивний дохід до цього моменту - ще за старою ставкою
+    _add_clicks(player, *pending)
+    _players.put(user_id, server_id, player)
+
+def apply_pending_clicks() -> int:
+    """Записує всі накопичені кліки пачкою. Повертає скільки гравців оновлено."""
+    with lock:
+        keys = list(_pending_clicks)
+        for user_id, server_id in keys:
+            _settle_clicks(user_id, server_id)
+        return len(keys)
+
+# Кліки не губляться при зупинці: цей обробник виконується раніше за close_all сховища
+atexit.register(apply_pending_clicks)
+
+@contextmanager
+def player_txn(user_id: int, server_id: int):
+    """Змінює кілька полів гравця за одне читання і один запис.
+
+    with player_txn(user_id, server_id) as player:
+        player.money += earned
+        player.last_click_time = now
+
+    Блок отримує копію гравця (None якщо профілю немає) з уже
+    нарахованими кліками і пасивним доходом, а копія
+    зберігається лише якщо блок завершився без помилки. Блок виконується
+    під замком сховища, тому інші зміни не вклиняться між полями.
+    Всередині блоку не можна робити await: з async коду транзакція
+    запускається в потоці сховища через update_player.
+    """
+    with lock:
+        _settle_clicks(user_id, server_id)
+        player = _players.get(user_id, server_id)
+        draft = copy.copy(player) if player is not None else None
+        if draft is not None:
+            # Пасивний дохід - за старою ставкою, до будь-якої зміни
+            _settle_idle(draft, time.time())
+        yield draft
+        if draft is not None:
+            _players.put(user_id, server_id, draft)
+
+def update_player(user_id: int, server_id: int, func):
+    """Виконує func(player) в одній транзакції. Повертає її результат або None без профілю."""
+    with player_txn(user_id, server_id) as player:
+        if player is None:
+            return None
+        return func(player)
 
 def add_money(user_id: int, server_id: int, amount: int):
     """Додає гроші гравцю."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key in data["users"]:
-        data["users"][key]["money"] += amount
-        save_data(data)
+    with player_txn(user_id, server_id) as player:
+        if player is not None:
+            player.money += amount
 
 def update_click_time(user_id: int, server_id: int, timestamp: float):
     """Оновлює час останнього кліка."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
+    with player_txn(user_id, server_id) as player:
+        if player is not None:
+            player.last_click_time = timestamp
 
-    if key in data["users"]:
-        data["users"][key]["last_click_time"] = timestamp
-        save_data(data)
+def buy_click_upgrades(player: Player, count: int | None = None) -> tuple:
+    """Купує count апгрейдів кліка одним записом (в транзакції). count=None - скільки вистачить грошей.
 
-def upgrade_income_per_click(user_id: int, server_id: int) -> bool:
-    """Апгрейдить дохід за клік. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
+    Повертає (скільки куплено, скільки грошей бракує - 0 якщо куплено).
+    Більше MAX_BULK_UPGRADES за раз не купується: ціна такої кількості переповнює float.
+    """
+    if count is None:
+        count = max_affordable_upgrades(BASE_CLICK_UPGRADE_COST, player.level, player.money)
+        if count == 0:
+            return 0, calculate_upgrade_cost(BASE_CLICK_UPGRADE_COST, player.level) - player.money
+    elif count < 1:
+        raise ValueError("Кількість апгрейдів має бути додатною")
+    else:
+        count = min(count, MAX_BULK_UPGRADES)
+
+    # Кожен рівень дорожчий за попередній - сума вартостей усіх рівнів
+    cost = bulk_upgrade_cost(BASE_CLICK_UPGRADE_COST, player.level, count)
+
+    if player.money < cost:
+        return 0, cost - player.money
+
+    player.money -= cost
+    player.income_per_click += count
+    player.level += count
+    return count, 0
+
+def buy_idle_upgrades(player: Player, count: int | None = None) -> tuple:
+    """Купує count апгрейдів пасивного доходу одним записом (в транзакції). count=None - скільки вистачить грошей.
+
+    Повертає (скільки куплено, скільки грошей бракує - 0 якщо куплено).
+    Більше MAX_BULK_UPGRADES за раз не купується.
+    """
+    if count is not None:
+        if count < 1:
+            raise ValueError("Кількість апгрейдів має бути додатною")
+        count = min(count, MAX_BULK_UPGRADES)
 
-    if key not in data["users"]:
-        return False
+    # Вартість залежить від рівня гравця, а він від цього апгрейду не змінюється
+    cost = calculate_upgrade_cost(BASE_IDLE_UPGRADE_COST, player.level)
 
-    player = data["users"][key]
+    if count is None:
+        count = int(player.money // cost)
+        if count == 0:
+            return 0, cost - player.money
 
-    # Розраховуємо вартість на основі поточного рівня
-    cost = calculate_upgrade_cost(BASE_CLICK_UPGRADE_COST, player["level"])
+    if player.money < cost * count:
+        return 0, cost * count - player.money
 
-    if player["money"] < cost:
-        return False
+    player.money -= cost * count
+    player.income_per_sec += count
+    return count, 0
 
-    player["money"] -= cost
-    player["income_per_click"] += 1
-    player["level"] += 1
+def buy_click_upgrade(player: Player) -> int:
+    """Купує апгрейд кліка гравцю (в транзакції). Повертає скільки грошей бракує, 0 якщо куплено."""
+    return buy_click_upgrades(player, 1)[1]
 
-    save_data(data)
-    return True
+def buy_idle_upgrade(player: Player) -> int:
+    """Купує апгрейд пасивного доходу (в транзакції). Повертає скільки грошей бракує, 0 якщо куплено."""
+    return buy_idle_upgrades(player, 1)[1]
+
+def upgrade_income_per_click(user_id: int, server_id: int) -> bool:
+    """Апгрейдить дохід за клік. Повертає True якщо успішно."""
+    return update_player(user_id, server_id, buy_click_upgrade) == 0
 
 def upgrade_income_per_sec(user_id: int, server_id: int) -> bool:
     """Апгрейдить пасивний дохід. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    player = data["users"][key]
-
-    # Розраховуємо вартість на основі поточного рівня
-    cost = calculate_upgrade_cost(BASE_IDLE_UPGRADE_COST, player["level"])
-
-    if player["money"] < cost:
-        return False
-
-    player["money"] -= cost
-    player["income_per_sec"] += 1
-
-    save_data(data)
+    return update_player(user_id, server_id, buy_idle_upgrade) == 0
+
+def _set_field(user_id: int, server_id: int, field: str, value) -> bool:
+    """Встановлює одне поле гравця. Повертає True якщо гравець існує."""
+    with player_txn(user_id, server_id) as player:
+        if player is None:
+            return False
+        setattr(player, field, value)
     return True
 
 def set_player_money(user_id: int, server_id: int, amount: int) -> bool:
     """Встановлює гроші гравцю. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    data["users"][key]["money"] = max(0, amount)
-    save_data(data)
-    return True
+    return _set_field(user_id, server_id, "money", max(0, amount))
 
 def set_player_level(user_id: int, server_id: int, level: int) -> bool:
     """Встановлює рівень гравцю. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    data["users"][key]["level"] = max(1, level)
-    save_data(data)
-    return True
+    return _set_field(user_id, server_id, "level", max(1, level))
 
 def set_income_per_click(user_id: int, server_id: int, amount: int) -> bool:
     """Встановлює дохід за клік. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    data["users"][key]["income_per_click"] = max(1, amount)
-    save_data(data)
-    return True
+    return _set_field(user_id, server_id, "income_per_click", max(1, amount))
 
 def set_income_per_sec(user_id: int, server_id: int, amount: int) -> bool:
     """Встановлює дохід за секунду. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    data["users"][key]["income_per_sec"] = max(0, amount)
-    save_data(data)
-    return True
+    return _set_field(user_id, server_id, "income_per_sec", max(0, amount))
 
 def issue_certificate(user_id: int, server_id: int) -> bool:
     """Видає сертифікат гравцю. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    data["users"][key]["has_certificate"] = True
-    data["users"][key]["certificate_date"] = datetime.now().isoformat()
-    save_data(data)
+    with player_txn(user_id, server_id) as player:
+        if player is None:
+            return False
+        player.has_certificate = True
+        player.certificate_date = datetime.now().isoformat()
     return True
 
 def get_server_top(server_id: int, limit: int = 10) -> list:
     """Отримує ТОП-10 гравців на сервері."""
-    data = load_data()
-
-    # Фільтруємо гравців цього сервера
+    # Перші гравці сервера з індексу рейтингу - без сортування всього сервера
     server_players = [
-        player for player in data["users"].values()
-        if player["server_id"] == server_id
+        _players.get(user_id, server_id)
+        for user_id, _ in _money_board.top(server_id, limit)
     ]
 
-    # Сортуємо за грошима
-    server_players.sort(key=lambda x: x["money"], reverse=True)
-
-    # Беремо топ
     top_players = []
-    for idx, player in enumerate(server_players[:limit], 1):
-        top_players.append({
-            "position": idx,
-            "user_id": player["user_id"],
-            "money": player["money"],
-            "level": player["level"],
-            "income_per_click": player["income_per_click"]
-        })
+    for idx, player in enumerate(server_players, 1):
+        top_players.append(_top_entry(idx, player))
 
     return top_players
+
+def _top_entry(position: int, player: Player) -> dict:
+    """Рядок рейтингу для гравця."""
+    return {
+        "position": position,
+        "user_id": player.user_id,
+        "money": player.money,
+        "level": player.level,
+        "income_per_click": player.income_per_click
+    }
+
+def get_player_rank(user_id: int, server_id: int) -> tuple:
+    """Місце гравця за грошима і кількість гравців сервера: (місце або None, всього)."""
+    return _money_board.rank(server_id, user_id), _money_board.size(server_id)
+
+def get_rank_around(user_id: int, server_id: int, radius: int = 2) -> list:
+    """Гравець і до radius сусідів вище та нижче в рейтингу сервера."""
+    return [
+        _top_entry(position, _players.get(entry_user_id, server_id))
+        for position, entry_user_id, _ in _money_board.around(server_id, user_id, radius)
+    ]
+
+def get_certified_page(server_id: int, cursor=None, forward: bool = True, count: int = 20) -> tuple:
+    """Сторінка сертифікованих гравців сервера за датою сертифіката.
+
+    Повертає (номер першого з 1, [Player], курсор назад, курсор вперед).
+    """
+    start, keys, prev_cursor, next_cursor = _certified.page_keys(server_id, cursor, forward, count)
+    players = [_players.get(user_id, server_id) for _, user_id in keys]
+    return start, players, prev_cursor, next_cursor
+
+def count_certified_players(server_id: int) -> int:
+    """Кількість гравців сервера з сертифікатом."""
+    return _certified.size(server_id)
+
 def clear_active_game(user_id: int, server_id: int, active_games: dict) -> bool:
     """Очищує активну гру гравця для оновлення даних. Повертає True якщо успішно."""
     key = (user_id, server_id)
@@ -229,20 +408,16 @@ def clear_active_game(user_id: int, server_id: int, active_games: dict) -> bool:
 
 def reset_player_progress(user_id: int, server_id: int) -> bool:
     """Скидує прогрес гравця на початковий рівень. Повертає True якщо успішно."""
-    data = load_data()
-    key = get_player_key(user_id, server_id)
-
-    if key not in data["users"]:
-        return False
-
-    # Скидуємо всі параметри на початкові значення
-    data["users"][key]["money"] = 0
-    data["users"][key]["income_per_click"] = 1
-    data["users"][key]["income_per_sec"] = 0
-    data["users"][key]["level"] = 1
-    data["users"][key]["last_click_time"] = 0
-    data["users"][key]["has_certificate"] = False
-    data["users"][key]["certificate_date"] = None
-
-    save_data(data)
+    with player_txn(user_id, server_id) as player:
+        if player is None:
+            return False
+
+        # Скидуємо всі параметри на початкові значення
+        player.money = 0
+        player.income_per_click = 1
+        player.income_per_sec = 0
+        player.level = 1
+        player.last_click_time = 0
+        player.has_certificate = False
+        player.certificate_date = None
     return True
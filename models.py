@@ -0,0 +1,88 @@
+"""
+Моделі записів для Discord Бота
+У пам'яті записи тримаються як об'єкти зі __slots__, а в файлах - як словники
+"""
+
+import functools
+from dataclasses import dataclass, fields
+
+
+@functools.cache
+def _field_names(cls) -> tuple:
+    """Назви полів моделі (рахуються один раз на клас)."""
+    return tuple(field.name for field in fields(cls))
+
+
+class Record:
+    """Перетворення запису зі словника файлу і назад."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Створює запис зі словника. Невідомі ключі ігноруються."""
+        return cls(**{name: data[name] for name in _field_names(cls) if name in data})
+
+    def to_dict(self) -> dict:
+        """Повертає запис як словник для файлу."""
+        return {name: getattr(self, name) for name in _field_names(type(self))}
+
+# ============ КЛІКЕР ============
+
+@dataclass(slots=True)
+class Player(Record):
+    """Профіль гравця."""
+    user_id: int
+    server_id: int
+    money: float = 0
+    income_per_click: int = 1
+    income_per_sec: int = 0
+    level: int = 1
+    last_click_time: float = 0
+    last_settled: float = 0  # До якого часу нараховано пасивний дохід (0 - ще ні разу)
+    created_at: str = ""
+    has_certificate: bool = False
+    certificate_date: str | None = None
+
+# ============ БІЗНЕС ============
+
+@dataclass(slots=True)
+class BusinessHolding(Record):
+    """Куплений бізнес одного типу."""
+    name: str = ""
+    price: int = 0
+    emoji: str = ""
+    count: int = 1
+    bought_at: str = ""
+
+
+def decode_businesses(data: dict) -> dict:
+    """Бізнеси гравця з файлу: {business_key: BusinessHolding}."""
+    return {key: BusinessHolding.from_dict(holding) for key, holding in data.items()}
+
+def encode_businesses(businesses: dict) -> dict:
+    """Бізнеси гравця для файлу."""
+    return {key: holding.to_dict() for key, holding in businesses.items()}
+
+# ============ КАЗИНО ============
+
+@dataclass(slots=True)
+class CasinoStats(Record):
+    """Казино статистика гравця."""
+    wins: int = 0
+    losses: int = 0
+    total_bet: int = 0
+
+# ============ БАНОЧКА ============
+
+@dataclass(slots=True)
+class Banka(Record):
+    """Баночка молочка гравця."""
+    user_id: int
+    server_id: int
+    progress: int = 0  # 0, 25, 50, 75, 100
+    completed: bool = False
+    created_at: str = ""
+    completed_at: str | None = None
+    completed_count: int = 0
+    total_completed: int = 0
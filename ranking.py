@@ -0,0 +1,326 @@
+"""
+Рейтинги гравців для Discord Бота
+Відсортовані індекси по серверах, що оновлюються при кожній зміні запису
+"""
+
+import random
+
+from storage import lock, store
+
+# Всі рейтинги для !top: {назва: Leaderboard}
+BOARDS = {}
+
+SKIPLIST_MAX_LEVEL = 32
+SKIPLIST_P = 0.25  # Ймовірність підняти вузол на рівень вище
+
+# ============ SKIP LIST ============
+
+class _Node:
+    """Вузол skip list: ключ, посилання вперед і їх довжини на кожному рівні."""
+
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        # width[i] - скільки вузлів нижнього рівня перескакує next[i]
+        # (для next[i] = None - відстань до кінця списку)
+        self.width = [1] * level
+
+
+class SkipList:
+    """Відсортована множина ключів з пошуком за позицією (indexable skip list).
+
+    Вставка, видалення, rank(key) і at(index) - за O(log n),
+    k ключів підряд від позиції - за O(log n + k).
+    """
+
+    def __init__(self):
+        self._head = _Node(None, SKIPLIST_MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < SKIPLIST_MAX_LEVEL and random.random() < SKIPLIST_P:
+            level += 1
+        return level
+
+    def _path(self, key) -> tuple:
+        """Останні вузли з ключем < key на кожному рівні та їх позиції (голова - 0)."""
+        path = [self._head] * SKIPLIST_MAX_LEVEL
+        positions = [0] * SKIPLIST_MAX_LEVEL
+        node = self._head
+        position = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            path[level] = node
+            positions[level] = position
+        return path, positions
+
+    def insert(self, key):
+        """Додає ключ (ключі мають бути унікальні)."""
+        path, positions = self._path(key)
+        level = self._random_level()
+        self._level = max(self._level, level)
+        node = _Node(key, level)
+        node_position = positions[0] + 1
+        for index in range(level):
+            previous = path[index]
+            node.next[index] = previous.next[index]
+            node.width[index] = previous.width[index] - (node_position - positions[index]) + 1
+            previous.next[index] = node
+            previous.width[index] = node_position - positions[index]
+        # Вищі посилання тепер перескакують на один вузол більше
+        for index in range(level, SKIPLIST_MAX_LEVEL):
+            path[index].width[index] += 1
+        self._size += 1
+
+    def remove(self, key) -> bool:
+        """Видаляє ключ. Повертає True якщо він був."""
+        path, _ = self._path(key)
+        node = path[0].next[0]
+        if node is None or node.key != key:
+            return False
+        level = len(node.next)
+        for index in range(level):
+            path[index].next[index] = node.next[index]
+            path[index].width[index] += node.width[index] - 1
+        for index in range(level, SKIPLIST_MAX_LEVEL):
+            path[index].width[index] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key) -> int | None:
+        """Позиція ключа (з 0) або None якщо його немає."""
+        path, positions = self._path(key)
+        node = path[0].next[0]
+        if node is None or node.key != key:
+            return None
+        return positions[0]
+
+    def _node_at(self, index: int):
+        """Вузол на позиції index (з 0)."""
+        target = index + 1
+        node = self._head
+        position = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and position + node.width[level] <= target:
+                position += node.width[level]
+                node = node.next[level]
+        return node
+
+    def at(self, index: int):
+        """Ключ на позиції index (з 0)."""
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+    def slice(self, start: int, count: int) -> list:
+        """count ключів підряд, починаючи з позиції start (з 0)."""
+        if start >= self._size or count <= 0:
+            return []
+        node = self._node_at(max(0, start))
+        result = []
+        while node is not None and len(result) < count:
+            result.append(node.key)
+            node = node.next[0]
+        return result
+
+    def first(self, count: int) -> list:
+        """Перші count ключів."""
+        return self.slice(0, count)
+
+    def after(self, key, count: int) -> tuple:
+        """count ключів після key: (позиція першого з 0, ключі). key може вже не існувати."""
+        path, positions = self._path(key)
+        node = path[0].next[0]
+        start = positions[0]
+        if node is not None and node.key == key:
+            node = node.next[0]
+            start += 1
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return start, keys
+
+    def before(self, key, count: int) -> tuple:
+        """count ключів перед key: (позиція першого з 0, ключі)."""
+        _, positions = self._path(key)
+        end = positions[0]  # Скільки ключів менші за key
+        start = max(0, end - count)
+        return start, self.slice(start, end - start)
+
+# ============ ІНДЕКС ============
+
+class SortedIndex:
+    """Відсортований індекс записів таблиці, окремо для кожного сервера.
+
+    key(запис) - значення для сортування (за зростанням) або None, якщо
+    запис не входить в індекс. Індекс сервера будується при першому запиті
+    з його записів, а далі оновлюється сховищем при кожному put/delete
+    таблиці. Ключ у skip list - (значення, user_id).
+    """
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key  # Функція: запис -> значення для сортування або None
+        self._boards = {}  # {server_id: SkipList}
+        self._keys = {}  # {server_id: {user_id: ключ у SkipList}}
+        store.add_listener(table, self)
+
+    def _entry(self, user_id: int, record):
+        """Ключ запису в skip list або None, якщо запис не в індексі."""
+        if record is None:
+            return None
+        value = self.key(record)
+        return (value, user_id) if value is not None else None
+
+    def _board(self, server_id: int) -> SkipList:
+        """Індекс сервера (будується при першому зверненні)."""
+        board = self._boards.get(server_id)
+        if board is None:
+            board = SkipList()
+            keys = {}
+            for user_id, record in self.table.server_records(server_id).items():
+                key = self._entry(user_id, record)
+                if key is not None:
+                    board.insert(key)
+                    keys[user_id] = key
+            self._boards[server_id] = board
+            self._keys[server_id] = keys
+        return board
+
+    def update(self, user_id: int, server_id: int, record):
+        """Оновлює позицію запису (record=None - запис видалено)."""
+        board = self._boards.get(server_id)
+        if board is None:
+            return  # Сервер ще не запитували - індекс побудується пізніше
+        keys = self._keys[server_id]
+        key = self._entry(user_id, record)
+        old_key = keys.get(user_id)
+        if key == old_key:
+            return  # Значення не змінилось (наприклад, оновився лише час кліка)
+        if old_key is not None:
+            board.remove(old_key)
+            del keys[user_id]
+        if key is not None:
+            board.insert(key)
+            keys[user_id] = key
+
+    def reset(self):
+        """Скидає всі індекси (після заміни всієї таблиці)."""
+        self._boards = {}
+        self._keys = {}
+
+    def keys(self, server_id: int, count: int) -> list:
+        """Перші count ключів сервера: [(значення, user_id)]."""
+        with lock:
+            return self._board(server_id).first(count)
+
+    def page_keys(self, server_id: int, cursor=None, forward: bool = True, count: int = 10) -> tuple:
+        """Сторінка індексу від курсора.
+
+        Повертає (позиція першого запису з 1, [(значення, user_id)],
+        курсор попередньої сторінки, курсор наступної сторінки).
+        Курсор - ключ крайнього запису сторінки, None - сторінки немає.
+        Сторінка шукається за O(log n) незалежно від глибини.
+        """
+        with lock:
+            board = self._board(server_id)
+            if cursor is None:
+                start, keys = 0, board.first(count)
+            elif forward:
+                start, keys = board.after(cursor, count)
+            else:
+                start, keys = board.before(cursor, count)
+            if not keys and cursor is not None:
+                start, keys = 0, board.first(count)  # Курсор застарів - з початку
+            prev_cursor = keys[0] if keys and start > 0 else None
+            next_cursor = keys[-1] if keys and start + len(keys) < len(board) else None
+            return start + 1, keys, prev_cursor, next_cursor
+
+    def size(self, server_id: int) -> int:
+        """Скільки записів сервера в індексі."""
+        with lock:
+            return len(self._board(server_id))
+
+    def position(self, server_id: int, user_id: int) -> int | None:
+        """Позиція запису (з 1) або None якщо його немає в індексі."""
+        with lock:
+            board = self._board(server_id)
+            key = self._keys[server_id].get(user_id)
+            if key is None:
+                return None
+            return board.rank(key) + 1
+
+# ============ РЕЙТИНГ ============
+
+class Leaderboard(SortedIndex):
+    """Рейтинг записів таблиці за одним значенням, окремо для кожного сервера.
+
+    Ключ у skip list - (-значення, user_id), тому найбільші значення йдуть першими.
+    """
+
+    def __init__(self, table, value, title: str = "", value_format: str = ","):
+        self.value = value  # Функція: запис -> число для сортування
+        self.title = title  # Назва рейтингу для !top
+        self.value_format = value_format  # Формат значення (format spec)
+        super().__init__(table, lambda record: -value(record))
+
+    def top(self, server_id: int, limit: int) -> list:
+        """Перші limit гравців сервера як список (user_id, значення)."""
+        return [(user_id, -score) for score, user_id in self.keys(server_id, limit)]
+
+    def page(self, server_id: int, cursor=None, forward: bool = True, count: int = 10) -> tuple:
+        """Сторінка рейтингу від курсора.
+
+        Повертає (місце першого запису з 1, [(user_id, значення)],
+        курсор попередньої сторінки, курсор наступної сторінки).
+        """
+        start, keys, prev_cursor, next_cursor = self.page_keys(server_id, cursor, forward, count)
+        entries = [(user_id, -score) for score, user_id in keys]
+        return start, entries, prev_cursor, next_cursor
+
+    def format_value(self, value) -> str:
+        """Значення рейтингу для показу."""
+        return format(value, self.value_format)
+
+    def rank(self, server_id: int, user_id: int) -> int | None:
+        """Місце гравця (з 1) або None якщо його немає в рейтингу."""
+        return self.position(server_id, user_id)
+
+    def around(self, server_id: int, user_id: int, radius: int) -> list:
+        """Гравець і до radius сусідів вище та нижче: [(місце, user_id, значення)]."""
+        with lock:
+            position = self.rank(server_id, user_id)
+            if position is None:
+                return []
+            start = max(0, position - 1 - radius)
+            keys = self._board(server_id).slice(start, 2 * radius + 1)
+            return [
+                (start + offset + 1, entry_user_id, -score)
+                for offset, (score, entry_user_id) in enumerate(keys)
+            ]
+
+# ============ РЕЄСТР РЕЙТИНГІВ ============
+
+def register_board(name: str, table, value, title: str, value_format: str = ",") -> Leaderboard:
+    """Створює рейтинг по таблиці і реєструє його для !top [назва]."""
+    board = Leaderboard(table, value, title=title, value_format=value_format)
+    BOARDS[name] = board
+    return board
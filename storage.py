@@ -0,0 +1,1163 @@
+"""
+Сховище даних для Discord Бота
+Записи тримаються в пам'яті (JSON) або в SQLite, а на диск пишуться пачками
+
+Таблиця отримує decode/encode (див. models.py): у пам'яті записи живуть
+як об'єкти моделей, а в файлах і базі - як словники. Всі таблиці належать
+одному сховищу гри (store), яке вміє виконувати зміни кількох таблиць
+однією транзакцією.
+"""
+
+import io
+import os
+import sys
+import copy
+import json
+import atexit
+import pickle
+import struct
+import shutil
+import asyncio
+import queue
+import sqlite3
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# ============ КОНФІГ СХОВИЩА ============
+# Бекенд сховища:
+#   "json"    - файли *.json, повний запис файлу раз на FLUSH_INTERVAL
+#   "journal" - файли *.json + журнал змін *.json.journal з фоновим ущільненням
+#   "sharded" - окремий файл на кожен сервер: game_data/<server_id>.json і т.д.
+#   "sqlite"  - один файл бази SQLITE_FILE
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_FILE = os.getenv("SQLITE_FILE", "game_data.db")
+
+# Формат знімків для файлових бекендів:
+#   "json"   - *.json з відступами (як раніше)
+#   "binary" - компактний *.bin із заголовком версії (msgpack, або pickle без msgpack)
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "json").lower()
+
+FLUSH_INTERVAL = 10  # Секунди між записами змін на диск
+JOURNAL_COMPACT_EVERY = 5000  # Записів у журналі до ущільнення у знімок
+
+# Спільний замок усіх таблиць: сховище використовують і цикл подій,
+# і потік сховища
+lock = threading.RLock()
+
+# Один потік сховища: завдання виконуються строго по черзі, тому зміни
+# одного гравця застосовуються в тому порядку, в якому їх надіслали
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+
+def locked(method):
+    """Виконує метод таблиці під спільним замком сховища."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return method(*args, **kwargs)
+    return wrapper
+
+# Потік запису знімків: кодування і fsync не тримають ні замок, ні потік сховища.
+# Завдання виконуються по черзі, тому старший знімок не перепише новіший
+_write_queue = queue.Queue()
+_writer = None
+
+def _writer_loop():
+    """Виконує завдання запису по черзі (потік запису)."""
+    while True:
+        job = _write_queue.get()
+        try:
+            job()
+        finally:
+            _write_queue.task_done()
+
+def submit_write(job):
+    """Передає завдання запису потоку запису (запускає потік при першому виклику)."""
+    global _writer
+    with lock:
+        if _writer is None or not _writer.is_alive():
+            try:
+                _writer = threading.Thread(target=_writer_loop, name="storage-writer", daemon=True)
+                _writer.start()
+            except RuntimeError:
+                # Під час виходу з процесу новий потік може не запуститись - пишемо одразу
+                job()
+                return
+        _write_queue.put(job)
+
+def wait_writes():
+    """Чекає, поки потік запису виконає всі передані завдання."""
+    _write_queue.join()
+
+async def run_storage(func, *args, **kwargs):
+    """Виконує функцію сховища в потоці сховища, не блокуючи цикл подій."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def _identity(record):
+    """Кодек за замовчуванням: запис зберігається як є."""
+    return record
+
+def encode_records(records: dict, encode) -> dict:
+    """Кодує записи {ключ: запис} у словники для файлу."""
+    return {key: encode(record) for key, record in records.items()}
+
+def decode_records(records: dict, decode) -> dict:
+    """Декодує записи {ключ: словник} з файлу в об'єкти моделей."""
+    return {key: decode(record) for key, record in records.items()}
+
+def to_async(func):
+    """Робить з функції сховища корутину, що виконується в потоці сховища."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_storage(func, *args, **kwargs)
+    return wrapper
+
+def read_json_records(path: str, root: str | None) -> dict:
+    """Читає записи з JSON файлу. Порожній словник якщо файлу немає.
+
+    Битий файл не перетворюється на порожню таблицю (наступний запис
+    знищив би дані): бот не стартує, поки файл не відновлять.
+    """
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except Exception as e:
+            raise RuntimeError(f"Файл {path} пошкоджений ({e}). Відновіть його з резервної копії") from e
+        return doc.get(root, {}) if root else doc
+    return {}
+
+def write_atomic(path: str, data: bytes):
+    """Записує файл через тимчасовий файл, щоб збій не лишив його обрізаним."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# ============ ФОРМАТ ЗНІМКІВ ============
+# Бінарний знімок: заголовок "FTDB" + версія схеми (uint16) + кодек (uint8),
+# далі документ, закодований кодеком. Документ той самий, що й у JSON файлі.
+SNAPSHOT_MAGIC = b"FTDB"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct(">4sHB")
+CODEC_MSGPACK = 1
+CODEC_PICKLE = 2
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    """Unpickler, що дозволяє лише прості типи (dict, list, str, числа)."""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Заборонений тип у знімку: {module}.{name}")
+
+
+def binary_path(path: str) -> str:
+    """Шлях бінарного знімку для JSON файлу: game_data.json -> game_data.bin."""
+    return os.path.splitext(path)[0] + ".bin"
+
+def snapshot_path(path: str) -> str:
+    """Шлях, куди пишеться знімок у поточному форматі."""
+    return binary_path(path) if SNAPSHOT_FORMAT == "binary" else path
+
+def encode_binary(doc) -> bytes:
+    """Кодує документ у бінарний знімок з заголовком."""
+    if msgpack is not None:
+        return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, CODEC_MSGPACK) + \
+            msgpack.packb(doc, use_bin_type=True)
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, CODEC_PICKLE) + \
+        pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+
+def decode_binary(data: bytes):
+    """Декодує бінарний знімок. Кидає ValueError, якщо формат невідомий."""
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise ValueError("знімок коротший за заголовок")
+    magic, version, codec = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("це не бінарний знімок")
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"знімок версії {version} новіший за підтримувану {SNAPSHOT_VERSION}")
+    payload = memoryview(data)[SNAPSHOT_HEADER.size:]
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("знімок записаний msgpack, але msgpack не встановлений")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    if codec == CODEC_PICKLE:
+        return _PlainUnpickler(io.BytesIO(payload)).load()
+    raise ValueError(f"невідомий кодек знімку {codec}")
+
+def dump_snapshot(doc, indent: int) -> bytes:
+    """Кодує документ у поточному форматі знімків."""
+    if SNAPSHOT_FORMAT == "binary":
+        return encode_binary(doc)
+    return json.dumps(doc, indent=indent, ensure_ascii=False).encode("utf-8")
+
+def read_snapshot(path: str, root: str | None) -> dict:
+    """Читає записи знімку. У бінарному форматі без *.bin читається старий *.json.
+
+    У форматі JSON новіший *.bin означає, що дані вже жили в бінарному
+    форматі: читати застарілий *.json не можна, його спершу треба
+    сконвертувати назад.
+    """
+    bin_path = binary_path(path)
+    if SNAPSHOT_FORMAT != "binary":
+        if os.path.exists(bin_path) and (not os.path.exists(path)
+                                         or os.path.getmtime(bin_path) > os.path.getmtime(path)):
+            raise RuntimeError(
+                f"{bin_path} новіший за {path}, а SNAPSHOT_FORMAT=json. "
+                f"Спершу виконайте: python storage.py convert --to-json {path}"
+            )
+        return read_json_records(path, root)
+    if not os.path.exists(bin_path):
+        return read_json_records(path, root)
+    try:
+        with open(bin_path, "rb") as f:
+            doc = decode_binary(f.read())
+    except Exception as e:
+        raise RuntimeError(f"Файл {bin_path} пошкоджений ({e}). Відновіть його з резервної копії") from e
+    return doc.get(root, {}) if root else doc
+
+def snapshot_exists(path: str) -> bool:
+    """Чи є знімок у поточному форматі."""
+    return os.path.exists(snapshot_path(path))
+
+def convert_snapshot(path: str, to_json: bool = False) -> str:
+    """Конвертує JSON файл у бінарний знімок (або назад). Повертає шлях результату.
+
+    Вихідний файл перейменовується на *.converted, щоб поруч не лишалась
+    застаріла копія, яку інший формат прочитав би як актуальну.
+    """
+    if to_json:
+        source, target = binary_path(path), path
+        with open(source, "rb") as f:
+            doc = decode_binary(f.read())
+        write_atomic(target, json.dumps(doc, indent=2, ensure_ascii=False).encode("utf-8"))
+    else:
+        source, target = path, binary_path(path)
+        with open(source, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        write_atomic(target, encode_binary(doc))
+    os.replace(source, source + ".converted")
+    return target
+
+# ============ ТАБЛИЦЯ У ПАМ'ЯТІ ============
+
+class JsonTable:
+    """Таблиця записів гравців поверх одного JSON файлу.
+
+    Файл читається один раз при першому доступі. Зміни лише позначають
+    таблицю брудною, а на диск вона потрапляє в flush().
+    """
+
+    def __init__(self, path: str, root: str | None = None, sep: str = "-", indent: int = 2,
+                 decode=None, encode=None):
+        self.path = path
+        self.root = root  # Ключ верхнього рівня в документі ("users", ...) або None
+        self.sep = sep  # Роздільник у ключі "user_id{sep}server_id"
+        self.indent = indent
+        self.decode = decode or _identity  # Словник з файлу -> запис
+        self.encode = encode or _identity  # Запис -> словник для файлу
+        self._records = None
+        self._servers = None  # {server_id: {user_id: ключ}} - будується при першій вибірці по серверу
+        self._dirty = False
+
+    def key(self, user_id: int, server_id: int) -> str:
+        """Генерує ключ запису."""
+        return f"{user_id}{self.sep}{server_id}"
+
+    def _parse_key(self, key: str) -> tuple | None:
+        """(user_id, server_id) з ключа запису або None для чужого ключа."""
+        parts = key.split(self.sep)
+        if len(parts) != 2:
+            return None
+        try:
+            return int(parts[0]), int(parts[1])
+        except ValueError:
+            return None
+
+    def _server_index(self) -> dict:
+        """Ключі записів по серверах (один прохід по таблиці при першому зверненні)."""
+        if self._servers is None:
+            servers = {}
+            for key in self.records:
+                ids = self._parse_key(key)
+                if ids is not None:
+                    servers.setdefault(ids[1], {})[ids[0]] = key
+            self._servers = servers
+        return self._servers
+
+    def _index_put(self, user_id: int, server_id: int):
+        """Додає ключ запису в індекс серверів (якщо він уже побудований)."""
+        if self._servers is not None:
+            self._servers.setdefault(server_id, {})[user_id] = self.key(user_id, server_id)
+
+    def _index_delete(self, user_id: int, server_id: int):
+        """Прибирає ключ запису з індексу серверів."""
+        if self._servers is not None:
+            keys = self._servers.get(server_id)
+            if keys is not None:
+                keys.pop(user_id, None)
+                if not keys:
+                    del self._servers[server_id]
+
+    @property
+    def records(self) -> dict:
+        """Всі записи таблиці (завантажуються при першому доступі)."""
+        if self._records is None:
+            self._records = decode_records(read_snapshot(self.path, self.root), self.decode)
+        return self._records
+
+    def peek(self, user_id: int, server_id: int):
+        """Отримує запис без запису в журнал відкату транзакції."""
+        return self.records.get(self.key(user_id, server_id))
+
+    @locked
+    def get(self, user_id: int, server_id: int):
+        """Отримує запис або None."""
+        store.remember(self, user_id, server_id)
+        return self.peek(user_id, server_id)
+
+    @locked
+    def put(self, user_id: int, server_id: int, record):
+        """Зберігає запис у пам'яті і позначає таблицю брудною."""
+        store.remember(self, user_id, server_id)
+        self.records[self.key(user_id, server_id)] = record
+        self._index_put(user_id, server_id)
+        self._dirty = True
+        store.changed(self, user_id, server_id, record)
+
+    @locked
+    def delete(self, user_id: int, server_id: int) -> bool:
+        """Видаляє запис. Повертає True якщо він був."""
+        store.remember(self, user_id, server_id)
+        key = self.key(user_id, server_id)
+        if key not in self.records:
+            return False
+        del self.records[key]
+        self._index_delete(user_id, server_id)
+        self._dirty = True
+        store.changed(self, user_id, server_id, None)
+        return True
+
+    @locked
+    def scan(self) -> list:
+        """Всі записи як список (user_id, server_id, record)."""
+        result = []
+        for key, record in self.records.items():
+            ids = self._parse_key(key)
+            if ids is not None:
+                result.append((*ids, record))
+        return result
+
+    @locked
+    def server_records(self, server_id: int) -> dict:
+        """Всі записи одного сервера у форматі {user_id: record} (через індекс серверів)."""
+        records = self.records
+        return {user_id: records[key] for user_id, key in self._server_index().get(server_id, {}).items()}
+
+    @locked
+    def server_ids(self) -> list:
+        """Сервери, на яких є записи."""
+        return list(self._server_index())
+
+    @locked
+    def top(self, server_id: int, field: str, limit: int) -> list:
+        """Записи сервера з найбільшим значенням поля."""
+        records = list(self.server_records(server_id).values())
+        records.sort(key=lambda record: getattr(record, field), reverse=True)
+        return records[:limit]
+
+    @locked
+    def document(self) -> dict:
+        """Повертає копію документа у форматі JSON файлу."""
+        records = encode_records(self.records, self.encode)
+        return {self.root: records} if self.root else records
+
+    @locked
+    def replace(self, doc: dict):
+        """Замінює весь документ (у форматі JSON файлу)."""
+        records = doc.get(self.root, {}) if self.root else doc
+        self._records = decode_records(records, self.decode)
+        self._servers = None
+        self._dirty = True
+        store.changed_all(self)
+
+    @locked
+    def mark_dirty(self):
+        """Позначає таблицю зміненою (після зміни запису на місці)."""
+        self._dirty = True
+
+    def flush(self):
+        """Передає таблицю потоку запису, якщо вона змінена або файлу ще немає."""
+        with lock:
+            if not self._dirty and snapshot_exists(self.path):
+                return
+            self._dirty = False
+            # Під замком - лише копія словника; кодування і запис - у потоці запису
+            records = dict(self.records)
+        submit_write(functools.partial(self._write_records, records))
+
+    def _write_records(self, records: dict):
+        """Кодує і пише знімок (у потоці запису). Після помилки таблиця знову брудна.
+
+        Запис, змінений на місці під час кодування, потім зберігається
+        через put і знову позначає таблицю брудною - наступний flush його допише.
+        """
+        try:
+            encoded = encode_records(records, self.encode)
+            doc = {self.root: encoded} if self.root else encoded
+            write_atomic(snapshot_path(self.path), dump_snapshot(doc, self.indent))
+        except Exception as e:
+            print(f"❌ Помилка запису {self.path}: {e}")
+            with lock:
+                self._dirty = True
+
+    def wait(self):
+        """Чекає, поки потік запису допише знімки."""
+        wait_writes()
+
+    @locked
+    def load(self):
+        """Читає файл таблиці зараз, а не при першому доступі (битий файл зупиняє запуск)."""
+        self.records
+
+# ============ ТАБЛИЦЯ З ЖУРНАЛОМ ============
+
+class JournalTable(JsonTable):
+    """JsonTable, що дописує кожну зміну в журнал замість перезапису файлу.
+
+    Рядок журналу - компактний JSON: ["ключ", запис] або ["ключ"] для
+    видалення. Коли журнал виростає до JOURNAL_COMPACT_EVERY записів,
+    таблиця пишеться у знімок (основний *.json) у фоновому потоці,
+    а журнал очищується. При старті знімок читається і журнал
+    програється поверх нього; обрізаний останній рядок пропускається.
+    """
+
+    def __init__(self, path: str, root: str | None = None, sep: str = "-", indent: int = 2,
+                 decode=None, encode=None):
+        super().__init__(path, root=root, sep=sep, indent=indent, decode=decode, encode=encode)
+        self.journal_path = path + ".journal"
+        self.rotated_path = path + ".journal.old"  # Журнал, що зараз ущільнюється
+        self._journal = None
+        self._journal_size = 0
+        self._compactor = None
+
+    @property
+    def records(self) -> dict:
+        """Знімок + програний журнал (завантажуються при першому доступі)."""
+        if self._records is None:
+            self._records = decode_records(read_snapshot(self.path, self.root), self.decode)
+            self._replay(self.rotated_path)
+            self._journal_size = self._replay(self.journal_path)
+        return self._records
+
+    def _replay(self, journal_path: str) -> int:
+        """Застосовує записи журналу до пам'яті. Повертає кількість записів.
+
+        Обрізаний хвіст (збій посеред запису) відрізається від файлу,
+        щоб нові записи не склеїлись з ним.
+        """
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        good_size = 0
+        with open(journal_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if len(entry) == 2:
+                    self._records[entry[0]] = self.decode(entry[1])
+                else:
+                    self._records.pop(entry[0], None)
+                good_size += len(line)
+                count += 1
+        if good_size < os.path.getsize(journal_path):
+            print(f"⚠️ Обрізаний запис у {journal_path} відкинуто")
+            with open(journal_path, "r+b") as f:
+                f.truncate(good_size)
+        return count
+
+    def _append(self, entry: list):
+        """Дописує один запис у журнал."""
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        self._journal_size += 1
+        if self._journal_size >= JOURNAL_COMPACT_EVERY:
+            self.compact()
+
+    @locked
+    def put(self, user_id: int, server_id: int, record):
+        """Зберігає запис у пам'яті та журналі."""
+        store.remember(self, user_id, server_id)
+        key = self.key(user_id, server_id)
+        self.records[key] = record
+        self._index_put(user_id, server_id)
+        self._append([key, self.encode(record)])
+        store.changed(self, user_id, server_id, record)
+
+    @locked
+    def delete(self, user_id: int, server_id: int) -> bool:
+        """Видаляє запис і фіксує це в журналі."""
+        store.remember(self, user_id, server_id)
+        key = self.key(user_id, server_id)
+        if key not in self.records:
+            return False
+        del self.records[key]
+        self._index_delete(user_id, server_id)
+        self._append([key])
+        store.changed(self, user_id, server_id, None)
+        return True
+
+    @locked
+    def replace(self, doc: dict):
+        """Замінює весь документ і одразу пише знімок."""
+        super().replace(doc)
+        self.compact()
+
+    @locked
+    def mark_dirty(self):
+        """Зміну на місці не видно в журналі, тому пишемо повний знімок."""
+        self.compact()
+
+    @locked
+    def compact(self):
+        """Ущільнює журнал: пише знімок таблиці у фоні та очищує журнал."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        # Під замком - лише копія словника; кодування і запис ідуть у фоні
+        records = dict(self.records)
+        # Нові зміни підуть у свіжий журнал, поки пишеться знімок
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.rotated_path):
+                # Попереднє ущільнення не завершилось - дописуємо до нього
+                with open(self.journal_path, "r", encoding="utf-8") as src, \
+                        open(self.rotated_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+        self._journal_size = 0
+        self._dirty = False
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(records,))
+        self._compactor.start()
+
+    def _write_snapshot(self, records: dict):
+        """Кодує і пише знімок на диск, потім видаляє вже врахований журнал.
+
+        Копія словника кодується без замку. Якщо запис змінять на місці
+        під час кодування, його put все одно потрапить у новий журнал,
+        який при старті програється поверх цього знімку.
+        """
+        try:
+            encoded = encode_records(records, self.encode)
+            doc = {self.root: encoded} if self.root else encoded
+            write_atomic(snapshot_path(self.path), dump_snapshot(doc, self.indent))
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+        except Exception as e:
+            print(f"❌ Помилка ущільнення {self.path}: {e}")
+
+    @locked
+    def flush(self):
+        """Скидає журнал на диск (fsync). Створює знімок, якщо його ще немає."""
+        if self._journal is not None:
+            os.fsync(self._journal.fileno())
+        if not snapshot_exists(self.path):
+            self.compact()
+
+    def wait(self):
+        """Чекає завершення фонового ущільнення."""
+        if self._compactor is not None:
+            self._compactor.join()
+
+# ============ ТАБЛИЦЯ З ШАРДАМИ ПО СЕРВЕРАХ ============
+
+class ShardedTable:
+    """Таблиця, розбита на окремі JSON файли по server_id.
+
+    Шард сервера читається лише коли до нього вперше звертаються,
+    а flush() переписує тільки змінені шарди. Файл шарду має той самий
+    формат, що й спільний JSON файл. Якщо теки шардів ще немає, спільний
+    файл розбивається на шарди при першому запуску.
+    """
+
+    def __init__(self, path: str, root: str | None = None, sep: str = "-", indent: int = 2,
+                 decode=None, encode=None):
+        self.path = path
+        self.root = root
+        self.sep = sep
+        self.indent = indent
+        self.decode = decode or _identity
+        self.encode = encode or _identity
+        self.shard_dir = os.path.splitext(path)[0]  # game_data.json -> game_data/
+        self._shards = {}
+        self._dirty = set()
+        if not os.path.isdir(self.shard_dir):
+            self._split_legacy_file()
+
+    def _split_legacy_file(self):
+        """Розбиває спільний файл (JSON або бінарний знімок) на шарди.
+
+        Шарди пишуться у тимчасову теку, яка перейменовується на теку
+        шардів лише коли записані всі. Збій посередині лишає спільний
+        файл недоторканим, і розбиття повториться при наступному запуску.
+        """
+        shards = {}
+        for key, record in read_snapshot(self.path, self.root).items():
+            parts = key.split(self.sep)
+            if len(parts) != 2:
+                continue
+            try:
+                server_id = int(parts[1])
+            except ValueError:
+                continue
+            shards.setdefault(server_id, {})[key] = record
+
+        tmp_dir = self.shard_dir + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)  # Залишок розбиття, що впало
+        os.makedirs(tmp_dir)
+        for server_id, records in shards.items():
+            doc = {self.root: records} if self.root else records
+            path = snapshot_path(os.path.join(tmp_dir, f"{server_id}.json"))
+            write_atomic(path, dump_snapshot(doc, self.indent))
+        os.replace(tmp_dir, self.shard_dir)
+
+    def key(self, user_id: int, server_id: int) -> str:
+        """Генерує ключ запису."""
+        return f"{user_id}{self.sep}{server_id}"
+
+    def shard_path(self, server_id: int) -> str:
+        """Шлях до файлу шарду сервера."""
+        return os.path.join(self.shard_dir, f"{server_id}.json")
+
+    def _shard(self, server_id: int) -> dict:
+        """Записи одного сервера (шард завантажується при першому доступі)."""
+        shard = self._shards.get(server_id)
+        if shard is None:
+            shard = decode_records(read_snapshot(self.shard_path(server_id), self.root), self.decode)
+            self._shards[server_id] = shard
+        return shard
+
+    def peek(self, user_id: int, server_id: int):
+        """Отримує запис без запису в журнал відкату транзакції."""
+        return self._shard(server_id).get(self.key(user_id, server_id))
+
+    @locked
+    def get(self, user_id: int, server_id: int):
+        """Отримує запис або None."""
+        store.remember(self, user_id, server_id)
+        return self.peek(user_id, server_id)
+
+    @locked
+    def put(self, user_id: int, server_id: int, record):
+        """Зберігає запис у шарді сервера."""
+        store.remember(self, user_id, server_id)
+        self._shard(server_id)[self.key(user_id, server_id)] = record
+        self._dirty.add(server_id)
+        store.changed(self, user_id, server_id, record)
+
+    @locked
+    def delete(self, user_id: int, server_id: int) -> bool:
+        """Видаляє запис. Повертає True якщо він був."""
+        store.remember(self, user_id, server_id)
+        shard = self._shard(server_id)
+        key = self.key(user_id, server_id)
+        if key not in shard:
+            return False
+        del shard[key]
+        self._dirty.add(server_id)
+        store.changed(self, user_id, server_id, None)
+        return True
+
+    @locked
+    def server_ids(self) -> list:
+        """Сервери, для яких є шард (на диску або в пам'яті)."""
+        ids = set(self._shards)
+        for name in os.listdir(self.shard_dir):
+            stem, ext = os.path.splitext(name)
+            if ext in (".json", ".bin") and stem.isdigit():
+                ids.add(int(stem))
+        return list(ids)
+
+    @locked
+    def server_records(self, server_id: int) -> dict:
+        """Всі записи одного сервера у форматі {user_id: record}."""
+        return {
+            int(key.split(self.sep)[0]): record
+            for key, record in self._shard(server_id).items()
+        }
+
+    @locked
+    def scan(self) -> list:
+        """Всі записи як список (user_id, server_id, record). Читає всі шарди."""
+        return [
+            (user_id, server_id, record)
+            for server_id in self.server_ids()
+            for user_id, record in self.server_records(server_id).items()
+        ]
+
+    @locked
+    def top(self, server_id: int, field: str, limit: int) -> list:
+        """Записи сервера з найбільшим значенням поля (тільки його шард)."""
+        records = list(self._shard(server_id).values())
+        records.sort(key=lambda record: getattr(record, field), reverse=True)
+        return records[:limit]
+
+    @locked
+    def document(self) -> dict:
+        """Збирає всі шарди в документ у форматі спільного JSON файлу."""
+        records = {}
+        for server_id in self.server_ids():
+            records.update(encode_records(self._shard(server_id), self.encode))
+        return {self.root: records} if self.root else records
+
+    @locked
+    def replace(self, doc: dict):
+        """Замінює всі записи таблиці."""
+        for server_id in self.server_ids():
+            self._shards[server_id] = {}
+            self._dirty.add(server_id)
+        for key, record in (doc.get(self.root, {}) if self.root else doc).items():
+            parts = key.split(self.sep)
+            if len(parts) != 2 or not parts[1].isdigit():
+                continue
+            server_id = int(parts[1])
+            self._shard(server_id)[key] = self.decode(record)
+            self._dirty.add(server_id)
+        store.changed_all(self)
+
+    @locked
+    def mark_dirty(self):
+        """Позначає всі завантажені шарди зміненими."""
+        self._dirty.update(self._shards)
+
+    def flush(self):
+        """Передає потоку запису тільки змінені шарди."""
+        with lock:
+            # Під замком - лише копії словників шардів; кодування і запис - у потоці запису
+            pending = {server_id: dict(self._shards[server_id]) for server_id in self._dirty}
+            self._dirty = set()
+        if pending:
+            submit_write(functools.partial(self._write_shards, pending))
+
+    def _write_shards(self, pending: dict):
+        """Кодує і пише шарди (у потоці запису). Шард, що не записався, знову брудний."""
+        for server_id, records in pending.items():
+            path = snapshot_path(self.shard_path(server_id))
+            try:
+                encoded = encode_records(records, self.encode)
+                doc = {self.root: encoded} if self.root else encoded
+                write_atomic(path, dump_snapshot(doc, self.indent))
+            except Exception as e:
+                print(f"❌ Помилка запису {path}: {e}")
+                with lock:
+                    self._dirty.add(server_id)
+
+    def wait(self):
+        """Чекає, поки потік запису допише шарди."""
+        wait_writes()
+
+    def load(self):
+        """Нічого не робить: шард читається при першому доступі, битий шард не дає працювати лише своєму серверу."""
+
+# ============ ТАБЛИЦЯ SQLITE ============
+
+_connection = None
+
+def get_connection() -> sqlite3.Connection:
+    """Спільне з'єднання з базою SQLite."""
+    global _connection
+    if _connection is None:
+        # Доступ з різних потоків серіалізується спільним замком
+        _connection = sqlite3.connect(SQLITE_FILE, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+    return _connection
+
+
+class SqliteTable:
+    """Таблиця записів у SQLite з тим самим інтерфейсом, що й JsonTable.
+
+    Запис зберігається як JSON у колонці data, а user_id, server_id та
+    колонки з columns винесені окремо під індекси. Зміни комітяться в flush().
+    """
+
+    def __init__(self, name: str, path: str, root: str | None = None, sep: str = "-",
+                 columns: tuple = (), decode=None, encode=None):
+        self.name = name
+        self.path = path
+        self.root = root
+        self.sep = sep
+        self.columns = columns
+        self.decode = decode or _identity
+        self.encode = encode or _identity
+        self.conn = get_connection()
+        self._create()
+
+    def _create(self):
+        """Створює таблицю та індекси. Переносить дані з JSON файлу при першому запуску."""
+        extra = "".join(f", {column} REAL" for column in self.columns)
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.name,)
+        ).fetchone()
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.name} "
+            f"(user_id INTEGER NOT NULL, server_id INTEGER NOT NULL{extra}, data TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.name}_user_server "
+            f"ON {self.name} (user_id, server_id)"
+        )
+        for column in self.columns:
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.name}_server_{column} "
+                f"ON {self.name} (server_id, {column})"
+            )
+        if not exists:
+            self.replace(read_snapshot(self.path, self.root), wrapped=False)
+        self.conn.commit()
+
+    def key(self, user_id: int, server_id: int) -> str:
+        """Генерує ключ запису (як у JSON файлі)."""
+        return f"{user_id}{self.sep}{server_id}"
+
+    def peek(self, user_id: int, server_id: int):
+        """Отримує запис без запису в журнал відкату транзакції."""
+        row = self.conn.execute(
+            f"SELECT data FROM {self.name} WHERE user_id = ? AND server_id = ?",
+            (user_id, server_id)
+        ).fetchone()
+        return self.decode(json.loads(row[0])) if row else None
+
+    @locked
+    def get(self, user_id: int, server_id: int):
+        """Отримує запис або None."""
+        store.remember(self, user_id, server_id)
+        return self.peek(user_id, server_id)
+
+    @locked
+    def put(self, user_id: int, server_id: int, record):
+        """Вставляє або оновлює запис."""
+        store.remember(self, user_id, server_id)
+        names = ", ".join(("user_id", "server_id") + self.columns + ("data",))
+        marks = ", ".join("?" * (len(self.columns) + 3))
+        updates = ", ".join(f"{name} = excluded.{name}" for name in self.columns + ("data",))
+        data = self.encode(record)
+        values = [data.get(column) for column in self.columns]
+        self.conn.execute(
+            f"INSERT INTO {self.name} ({names}) VALUES ({marks}) "
+            f"ON CONFLICT (user_id, server_id) DO UPDATE SET {updates}",
+            (user_id, server_id, *values, json.dumps(data, ensure_ascii=False))
+        )
+        store.changed(self, user_id, server_id, record)
+
+    @locked
+    def delete(self, user_id: int, server_id: int) -> bool:
+        """Видаляє запис. Повертає True якщо він був."""
+        store.remember(self, user_id, server_id)
+        cursor = self.conn.execute(
+            f"DELETE FROM {self.name} WHERE user_id = ? AND server_id = ?",
+            (user_id, server_id)
+        )
+        if cursor.rowcount == 0:
+            return False
+        store.changed(self, user_id, server_id, None)
+        return True
+
+    @locked
+    def scan(self) -> list:
+        """Всі записи як список (user_id, server_id, record)."""
+        rows = self.conn.execute(f"SELECT user_id, server_id, data FROM {self.name}").fetchall()
+        return [
+            (user_id, server_id, self.decode(json.loads(data)))
+            for user_id, server_id, data in rows
+        ]
+
+    @locked
+    def server_records(self, server_id: int) -> dict:
+        """Всі записи одного сервера у форматі {user_id: record}."""
+        rows = self.conn.execute(
+            f"SELECT user_id, data FROM {self.name} WHERE server_id = ?", (server_id,)
+        ).fetchall()
+        return {user_id: self.decode(json.loads(data)) for user_id, data in rows}
+
+    @locked
+    def server_ids(self) -> list:
+        """Сервери, на яких є записи."""
+        return [row[0] for row in self.conn.execute(f"SELECT DISTINCT server_id FROM {self.name}")]
+
+    @locked
+    def top(self, server_id: int, field: str, limit: int) -> list:
+        """Записи сервера з найбільшим значенням поля (через індекс)."""
+        if field not in self.columns:
+            raise ValueError(f"Колонка {field} не індексована в {self.name}")
+        rows = self.conn.execute(
+            f"SELECT data FROM {self.name} WHERE server_id = ? ORDER BY {field} DESC LIMIT ?",
+            (server_id, limit)
+        ).fetchall()
+        return [self.decode(json.loads(data)) for (data,) in rows]
+
+    @locked
+    def document(self) -> dict:
+        """Збирає всі записи в документ у форматі JSON файлу."""
+        rows = self.conn.execute(f"SELECT user_id, server_id, data FROM {self.name}").fetchall()
+        records = {
+            self.key(user_id, server_id): json.loads(data)
+            for user_id, server_id, data in rows
+        }
+        return {self.root: records} if self.root else records
+
+    @locked
+    def replace(self, doc: dict, wrapped: bool = True):
+        """Замінює всі записи таблиці."""
+        records = doc.get(self.root, {}) if wrapped and self.root else doc
+        self.conn.execute(f"DELETE FROM {self.name}")
+        for key, record in records.items():
+            parts = key.split(self.sep)
+            if len(parts) != 2:
+                continue
+            try:
+                user_id, server_id = int(parts[0]), int(parts[1])
+            except ValueError:
+                continue
+            self.put(user_id, server_id, self.decode(record))
+        store.changed_all(self)
+
+    @locked
+    def mark_dirty(self):
+        """Нічого не робить: SQLite не тримає записи в пам'яті."""
+
+    @locked
+    def flush(self):
+        """Комітить накопичені зміни."""
+        self.conn.commit()
+
+    def wait(self):
+        """Нічого не робить: SQLite пише синхронно."""
+
+    def load(self):
+        """Нічого не робить: дані з файлу перенесені в базу при відкритті таблиці."""
+
+
+# ============ СХОВИЩЕ ГРИ ============
+
+class GameStore:
+    """Всі таблиці гри (гравці, бізнеси, казино, баночки) в одному сховищі.
+
+    transaction() об'єднує зміни кількох таблиць: або застосовуються всі,
+    або при помилці всі відкочуються. Перед першою зміною запису в
+    транзакції запам'ятовується його копія (журнал відкату).
+
+    Слухачі таблиці (індекси, рейтинги) отримують кожну зміну запису:
+    listener.update(user_id, server_id, запис або None) і listener.reset()
+    після заміни всієї таблиці.
+    """
+
+    def __init__(self):
+        self.tables = {}  # {назва: таблиця}
+        self._listeners = {}  # {id(таблиці): [слухачі]}
+        self._depth = 0  # Вкладеність transaction()
+        self._undo = None  # {(таблиця, user_id, server_id): (таблиця, запис до транзакції)}
+
+    def open_table(self, name: str, path: str, root: str | None = None, sep: str = "-",
+                   indent: int = 2, columns: tuple = (), decode=None, encode=None):
+        """Відкриває таблицю вибраного бекенду (STORAGE_BACKEND) і реєструє її."""
+        codec = {"decode": decode, "encode": encode}
+        if STORAGE_BACKEND == "sqlite":
+            table = SqliteTable(name, path, root=root, sep=sep, columns=columns, **codec)
+        elif STORAGE_BACKEND == "journal":
+            table = JournalTable(path, root=root, sep=sep, indent=indent, **codec)
+        elif STORAGE_BACKEND == "sharded":
+            table = ShardedTable(path, root=root, sep=sep, indent=indent, **codec)
+        else:
+            table = JsonTable(path, root=root, sep=sep, indent=indent, **codec)
+        self.tables[name] = table
+        return table
+
+    def table(self, name: str):
+        """Таблиця за назвою ("players", "businesses", "casino", "banka")."""
+        return self.tables[name]
+
+    @contextmanager
+    def transaction(self):
+        """Виконує блок як одну транзакцію над усіма таблицями.
+
+        Вкладена транзакція є частиною зовнішньої: відкат робить лише
+        зовнішня. Весь блок тримає замок сховища, тому await всередині
+        робити не можна.
+
+        Атомарність гарантується в пам'яті, а на диску - лише для SQLite
+        (один commit). Файлові бекенди пишуть кожну таблицю окремо, а журнал
+        дописує кожен put одразу: збій процесу посеред транзакції або між
+        записами файлів може лишити на диску лише частину її змін.
+        """
+        with lock:
+            outer = self._depth == 0
+            if outer:
+                self._undo = {}
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                if outer:
+                    self._rollback()
+                raise
+            finally:
+                self._depth -= 1
+                if outer:
+                    self._undo = None
+
+    def add_listener(self, table, listener):
+        """Підписує слухача на зміни записів таблиці."""
+        self._listeners.setdefault(id(table), []).append(listener)
+
+    def changed(self, table, user_id: int, server_id: int, record):
+        """Повідомляє слухачів таблиці про зміну запису (None - видалено)."""
+        for listener in self._listeners.get(id(table), ()):
+            listener.update(user_id, server_id, record)
+
+    def changed_all(self, table):
+        """Повідомляє слухачів таблиці, що замінено всі записи."""
+        for listener in self._listeners.get(id(table), ()):
+            listener.reset()
+
+    def remember(self, table, user_id: int, server_id: int):
+        """Запам'ятовує запис до першої зміни в транзакції (поза транзакцією - нічого)."""
+        if self._undo is None:
+            return
+        undo_key = (id(table), user_id, server_id)
+        if undo_key not in self._undo:
+            self._undo[undo_key] = (table, copy.deepcopy(table.peek(user_id, server_id)))
+
+    def _rollback(self):
+        """Повертає записи, змінені в транзакції, до початкового стану."""
+        undo, self._undo = self._undo, None
+        for (_, user_id, server_id), (table, record) in reversed(list(undo.items())):
+            if record is None:
+                table.delete(user_id, server_id)
+            else:
+                table.put(user_id, server_id, record)
+
+    def flush(self):
+        """Записує на диск всі змінені таблиці.
+
+        Копії всіх таблиць беруться під одним замком, тому знімки не
+        розрізають транзакцію навпіл (хоч файли й пишуться по черзі).
+        """
+        with lock:
+            for table in self.tables.values():
+                try:
+                    table.flush()
+                except Exception as e:
+                    print(f"❌ Помилка запису {table.path}: {e}")
+
+    def load(self):
+        """Читає всі таблиці одразу, щоб битий файл зупинив запуск, а не першу команду."""
+        for table in self.tables.values():
+            table.load()
+
+    def close(self):
+        """Записує всі зміни і чекає фонові записи (при виході з процесу)."""
+        self.flush()
+        for table in self.tables.values():
+            table.wait()
+
+
+class RecordVersions:
+    """Номери версій записів таблиці для кешів, побудованих з цих записів.
+
+    Версія запису змінюється при кожному put/delete, а після заміни всієї
+    таблиці - у всіх записів одразу. Однакова версія - той самий запис.
+    """
+
+    def __init__(self, table):
+        self._versions = {}  # {(user_id, server_id): номер зміни}
+        self._epoch = 0  # Номер заміни всієї таблиці
+        store.add_listener(table, self)
+
+    def update(self, user_id: int, server_id: int, record):
+        """Запис змінився."""
+        key = (user_id, server_id)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def reset(self):
+        """Замінено всі записи."""
+        self._epoch += 1
+        self._versions = {}
+
+    def version(self, user_id: int, server_id: int) -> tuple:
+        """Поточна версія запису."""
+        return self._epoch, self._versions.get((user_id, server_id), 0)
+
+
+# Єдине сховище гри
+store = GameStore()
+
+def open_table(name: str, path: str, root: str | None = None, sep: str = "-",
+               indent: int = 2, columns: tuple = (), decode=None, encode=None):
+    """Відкриває таблицю в сховищі гри.
+
+    decode/encode перетворюють словник з файлу на запис і назад
+    (наприклад Player.from_dict / Player.to_dict).
+    """
+    return store.open_table(name, path, root=root, sep=sep, indent=indent,
+                            columns=columns, decode=decode, encode=encode)
+
+def transaction():
+    """Транзакція над усіма таблицями сховища (див. GameStore.transaction)."""
+    return store.transaction()
+
+def load_all():
+    """Читає всі таблиці (при запуску бота). Битий файл даних - RuntimeError."""
+    store.load()
+
+def flush_all():
+    """Записує на диск всі змінені таблиці."""
+    store.flush()
+
+def close_all():
+    """Записує всі зміни і чекає фонові записи (при виході з процесу)."""
+    store.close()
+
+# Не втрачаємо незаписані зміни при виході
+atexit.register(close_all)
+
+
+# ============ КОНВЕРТЕР ============
+# python storage.py convert game_data.json business_data.json ...
+# python storage.py convert --to-json game_data.json   (назад у JSON)
+# Тека шардів (напр. game_data) конвертується файл за файлом.
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "convert":
+        print("Використання: python storage.py convert [--to-json] <файл.json | тека шардів> ...")
+        sys.exit(1)
+    to_json = "--to-json" in args
+    for target in [arg for arg in args[1:] if arg != "--to-json"]:
+        if os.path.isdir(target):
+            ext = ".bin" if to_json else ".json"
+            paths = [
+                os.path.join(target, os.path.splitext(name)[0] + ".json")
+                for name in sorted(os.listdir(target)) if name.endswith(ext)
+            ]
+        else:
+            paths = [target]
+        for path in paths:
+            print(f"✅ {path} -> {convert_snapshot(path, to_json=to_json)}")
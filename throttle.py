@@ -0,0 +1,176 @@
+"""
+Затримки дій для Discord Бота
+Cooldown кожної дії гравця з автоматичним видаленням прострочених записів (timing wheel)
+і token bucket обмеження кліків на гравця та на сервер
+"""
+
+import math
+import time
+
+CLICK_COOLDOWN = 0.5
+
+# Затримки дій гравця (секунди)
+ACTION_COOLDOWNS = {
+    "upgrade": 1.0,  # Апгрейд кліка
+    "banka": 0.5,  # Клік по баночці
+    "casino": 2.0,  # Спін рулетки
+}
+WHEEL_TICK = 0.1  # Секунди на один слот колеса
+
+# Кліки: в середньому один на CLICK_COOLDOWN, але можна коротку серію
+USER_CLICK_RATE = 1 / CLICK_COOLDOWN  # Кліків за секунду на гравця
+USER_CLICK_BURST = 4  # Скільки кліків гравця можна зробити підряд
+GUILD_CLICK_RATE = 20  # Кліків за секунду на весь сервер
+GUILD_CLICK_BURST = 40
+
+# Редагування повідомлень: Discord дозволяє близько 5 редагувань за 5 секунд на канал
+CHANNEL_EDIT_RATE = 1  # Редагувань за секунду на канал
+CHANNEL_EDIT_BURST = 5
+
+
+class CooldownWheel:
+    """Cooldown для (дія, user_id, server_id) з обмеженою пам'яттю.
+
+    Кожен запис лежить у слоті колеса за часом закінчення. При кожному
+    зверненні колесо прокручується до поточного часу і прострочені слоти
+    очищуються, тому в пам'яті лише ті, хто діяв протягом найдовшого
+    cooldown. Перевірка і встановлення - O(1).
+    """
+
+    def __init__(self, cooldowns: dict, tick: float = WHEEL_TICK):
+        self.cooldowns = dict(cooldowns)
+        self.tick = tick
+        # Слотів вистачає на найдовший cooldown, тому колесо не накладається саме на себе
+        self._slots = [set() for _ in range(math.ceil(max(self.cooldowns.values()) / tick) + 2)]
+        self._entries = {}  # {(дія, user_id, server_id): (час закінчення, номер слота)}
+        self._tick = int(time.monotonic() / tick)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _advance(self, now: float):
+        """Прокручує колесо до now і видаляє записи з прострочених слотів."""
+        tick = int(now / self.tick)
+        if tick - self._tick >= len(self._slots):
+            # Пройшов цілий оберт - прострочене все
+            for slot in self._slots:
+                slot.clear()
+            self._entries.clear()
+        else:
+            # Слоти тіків, що повністю минули (поточний тік ще не закінчився)
+            for passed in range(self._tick, tick):
+                slot = self._slots[passed % len(self._slots)]
+                for key in slot:
+                    del self._entries[key]
+                slot.clear()
+        self._tick = max(self._tick, tick)
+
+    def remaining(self, action: str, user_id: int, server_id: int, now: float | None = None) -> float:
+        """Скільки секунд ще чекати (0 - дія дозволена)."""
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+        entry = self._entries.get((action, user_id, server_id))
+        if entry is None:
+            return 0
+        return max(0, entry[0] - now)
+
+    def hit(self, action: str, user_id: int, server_id: int, now: float | None = None) -> float:
+        """Пробує виконати дію: 0 і cooldown починається, або скільки секунд ще чекати."""
+        now = time.monotonic() if now is None else now
+        wait = self.remaining(action, user_id, server_id, now)
+        if wait > 0:
+            return wait
+
+        key = (action, user_id, server_id)
+        old = self._entries.get(key)
+        if old is not None:
+            self._slots[old[1]].discard(key)  # Запис, що закінчується в поточному тіку
+        expires_at = now + self.cooldowns[action]
+        slot = int(expires_at / self.tick) % len(self._slots)
+        self._slots[slot].add(key)
+        self._entries[key] = (expires_at, slot)
+        return 0
+
+
+class TokenBucket:
+    """Token bucket для багатьох ключів: rate токенів за секунду, не більше burst.
+
+    Повний бакет нічим не відрізняється від нового, тому такі бакети
+    періодично видаляються - пам'ять займають лише активні ключі.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # {ключ: [токени, час оновлення]}
+        self._next_prune = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _tokens(self, key, now: float) -> list:
+        """Бакет ключа, поповнений до now."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def peek(self, key, now: float) -> bool:
+        """Чи є токен (без списання)."""
+        return self._tokens(key, now)[0] >= 1
+
+    def take(self, key, now: float):
+        """Списує токен (перевірка - через peek). Без перевірки бакет може піти в мінус."""
+        self._tokens(key, now)[0] -= 1
+
+    def prune(self, now: float):
+        """Видаляє бакети, що вже поповнились до повного (не частіше раз на час повного поповнення)."""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.burst / self.rate
+        for key in [key for key, (tokens, updated_at) in self._buckets.items()
+                    if tokens + (now - updated_at) * self.rate >= self.burst]:
+            del self._buckets[key]
+
+
+class InteractionLimiter:
+    """Обмеження кліків: бакет гравця на сервері і бакет всього сервера.
+
+    Зайві кліки не отримують відповіді з помилкою - обробник їх мовчки
+    пропускає, а тут рахується, скільки роботи відкинуто.
+    """
+
+    def __init__(self, user_rate: float = USER_CLICK_RATE, user_burst: int = USER_CLICK_BURST,
+                 guild_rate: float = GUILD_CLICK_RATE, guild_burst: int = GUILD_CLICK_BURST):
+        self.users = TokenBucket(user_rate, user_burst)
+        self.guilds = TokenBucket(guild_rate, guild_burst)
+        self.allowed = 0  # Скільки кліків пропущено в гру
+        self.dropped = {"user": 0, "guild": 0}  # Скільки відкинуто і через який ліміт
+
+    def allow(self, user_id: int, server_id: int, now: float | None = None) -> bool:
+        """True - клік можна обробити, False - клік відкинуто."""
+        now = time.monotonic() if now is None else now
+        self.users.prune(now)
+        self.guilds.prune(now)
+
+        if not self.users.peek((user_id, server_id), now):
+            self.dropped["user"] += 1
+            return False
+        if not self.guilds.peek(server_id, now):
+            self.dropped["guild"] += 1
+            return False
+
+        # Токен списується лише коли пройдено обидва ліміти
+        self.users.take((user_id, server_id), now)
+        self.guilds.take(server_id, now)
+        self.allowed += 1
+        return True
+
+
+# Спільні трекери для всіх модулів бота (використовуються лише з циклу подій)
+cooldowns = CooldownWheel(ACTION_COOLDOWNS)
+click_limiter = InteractionLimiter()
+channel_edits = TokenBucket(CHANNEL_EDIT_RATE, CHANNEL_EDIT_BURST)  # Ключ - id каналу
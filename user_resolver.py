@@ -0,0 +1,99 @@
+"""
+Імена користувачів для Discord Бота
+Спочатку кеш discord.py, потім власний LRU кеш, а промахи - паралельними запитами
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+
+import discord
+
+RESOLVER_CACHE_SIZE = 5000  # Скільки імен тримати в LRU кеші
+RESOLVER_TTL = 600  # Секунди, скільки ім'я вважається свіжим
+RESOLVER_MISS_TTL = 60  # Секунди для користувачів, яких немає в Discord
+RESOLVER_CONCURRENCY = 5  # Максимум одночасних запитів fetch_user
+
+
+class UserResolver:
+    """Перетворює user_id на ім'я для рейтингів.
+
+    Порядок: LRU кеш -> учасник сервера / користувач з кешу бота ->
+    bot.fetch_user (паралельно, не більше RESOLVER_CONCURRENCY запитів).
+    """
+
+    def __init__(self, bot, cache_size: int = RESOLVER_CACHE_SIZE, ttl: float = RESOLVER_TTL,
+                 concurrency: int = RESOLVER_CONCURRENCY):
+        self.bot = bot
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache = OrderedDict()  # {user_id: (ім'я або None, час закінчення)}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.fetches = 0  # Скільки HTTP запитів зроблено (для статистики)
+
+    def _cached(self, user_id: int):
+        """Ім'я з LRU кешу. Повертає (знайдено, ім'я)."""
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return False, None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._cache[user_id]
+            return False, None
+        self._cache.move_to_end(user_id)
+        return True, name
+
+    def _remember(self, user_id: int, name: str | None):
+        """Кладе ім'я в LRU кеш (None - користувача не знайдено)."""
+        ttl = self.ttl if name is not None else RESOLVER_MISS_TTL
+        self._cache[user_id] = (name, time.monotonic() + ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, user_id: int):
+        """Запитує користувача в Discord (з обмеженням паралельності). Повертає (кешувати, ім'я).
+
+        Промах кешується лише коли Discord відповів, що користувача немає.
+        Збій запиту (ліміт, мережа, 5xx) не кешується - наступний рейтинг спробує ще раз.
+        """
+        async with self._semaphore:
+            self.fetches += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+                return True, user.name
+            except discord.NotFound:
+                return True, None
+            except Exception:
+                return False, None
+
+    async def resolve(self, guild, user_ids: list) -> dict:
+        """Повертає {user_id: ім'я або None} для списку користувачів."""
+        names = {}
+        misses = []
+        for user_id in user_ids:
+            found, name = self._cached(user_id)
+            if not found:
+                user = (guild.get_member(user_id) if guild is not None else None) or self.bot.get_user(user_id)
+                if user is not None:
+                    name = user.name
+                    self._remember(user_id, name)
+                    found = True
+            if found:
+                names[user_id] = name
+            elif user_id not in misses:
+                misses.append(user_id)
+
+        if misses:
+            fetched = await asyncio.gather(*(self._fetch(user_id) for user_id in misses))
+            for user_id, (cacheable, name) in zip(misses, fetched):
+                if cacheable:
+                    self._remember(user_id, name)
+                names[user_id] = name
+
+        return names
+
+    async def display_name(self, guild, user_id: int) -> str:
+        """Ім'я одного користувача або 'Unknown User (id)'."""
+        name = (await self.resolve(guild, [user_id]))[user_id]
+        return name if name is not None else f"Unknown User ({user_id})"